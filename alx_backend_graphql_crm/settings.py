@@ -133,3 +133,70 @@ CRONJOBS = [
     ('*/5 * * * *', 'crm.cron.log_crm_heartbeat'),
     ('0 */12 * * *', 'crm.cron.update_low_stock'),
 ]
+
+# Rows per INSERT / lookup batch for the bulk GraphQL mutations
+CRM_BULK_CHUNK_SIZE = 1000
+
+# Rows committed per batch by the streaming /import/ endpoint
+CRM_IMPORT_BATCH_SIZE = 1000
+CRM_IMPORT_MAX_BATCH_SIZE = 10000
+
+# Products below the threshold are restocked by the increment
+CRM_LOW_STOCK_THRESHOLD = 10
+CRM_RESTOCK_INCREMENT = 10
+
+# Dotted path to the search backend used by the `search` filters; None picks
+# SQLite FTS5 or PostgreSQL pg_trgm based on the database in use.
+CRM_SEARCH_BACKEND = None
+
+# Parsed and validated GraphQL documents kept per process, and the cache
+# alias that stores query text for Automatic Persisted Queries. With no
+# CACHES setting 'default' is a per-process LocMemCache: every worker then
+# learns each hash on its own, costing clients one resend per worker. Name
+# a shared backend (Redis, Memcached, the database cache) to register a
+# query once for all of them.
+CRM_GRAPHQL_DOCUMENT_CACHE_SIZE = 256
+CRM_PERSISTED_QUERY_CACHE = 'default'
+
+# Cache alias for GraphQL query results; None (the default) turns result
+# caching off. Writes bump a per-model generation in the same cache, so the
+# alias must name a backend every process shares (Redis, Memcached or the
+# database cache): web workers, cron jobs and Celery tasks all write. A
+# per-process LocMemCache misses the others' writes; it is allowed for
+# local testing in a single process, and the crm.W001 check warns about it.
+# Results expire after CRM_RESPONSE_CACHE_TTL seconds, or sooner when a
+# selected field has a shorter hint ('Type.field': seconds, 0 = never cache).
+CRM_RESPONSE_CACHE = None
+CRM_RESPONSE_CACHE_TTL = 60
+CRM_RESPONSE_CACHE_FIELD_TTLS = {}
+
+# Cron and Celery jobs run their GraphQL documents in-process. Set a URL to
+# send them to a remote API instead, over one pooled HTTP session.
+CRM_GRAPHQL_REMOTE_URL = None
+CRM_GRAPHQL_REMOTE_TIMEOUT = 30
+
+# Orders read per chunk by the order reminder job
+CRM_REMINDER_CHUNK_SIZE = 1000
+
+# Budgets checked before a GraphQL operation runs. Cost estimates the
+# objects returned; lists and connections without first/last count as
+# DEFAULT_LIST_SIZE at the root and NESTED_LIST_SIZE below it (a customer's
+# orders, an order's items), since a flat default compounds per level.
+CRM_QUERY_MAX_DEPTH = 10
+CRM_QUERY_MAX_COST = 50000
+CRM_QUERY_DEFAULT_LIST_SIZE = 100
+CRM_QUERY_NESTED_LIST_SIZE = 10
+
+# Serve /graphql/ with the async view. Turn on when running under asgi.py
+# (uvicorn, daphne); under WSGI every request would pay for an event loop.
+CRM_GRAPHQL_ASYNC = False
+# The async view splits a query's root fields across at most this many
+# threads, the request's own included; the others come from a pool of
+# ROOT_FIELD_WORKERS per process, each holding a database connection.
+# Threads read separate snapshots; 1 runs every field on one connection.
+CRM_GRAPHQL_ROOT_FIELD_CONCURRENCY = 4
+CRM_GRAPHQL_ROOT_FIELD_WORKERS = 8
+
+# Rows fetched per round trip when a query is sent with stream=true. Under
+# ASGI streaming needs CRM_GRAPHQL_ASYNC, or Django buffers the response.
+CRM_STREAM_CHUNK_SIZE = 1000
@@ -14,12 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
-from graphene_django.views import GraphQLView
 from django.views.decorators.csrf import csrf_exempt
+from crm.views import AsyncGraphQLView, CachedGraphQLView, graphql_cache_stats, import_rows
+
+GraphQLView = AsyncGraphQLView if getattr(settings, 'CRM_GRAPHQL_ASYNC', False) else CachedGraphQLView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('graphql/', csrf_exempt(GraphQLView.as_view(graphiql=True))),
+    path('graphql/cache-stats/', graphql_cache_stats),
+    path('import/<str:model>/', csrf_exempt(import_rows)),
 ]
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, Warning, register
+
+
+@register(Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    """CRM_RESPONSE_CACHE must name a cache, and should name one every process shares"""
+    alias = getattr(settings, 'CRM_RESPONSE_CACHE', None)
+    if not alias:
+        return []
+    try:
+        cache = caches[alias]
+    except InvalidCacheBackendError:
+        return [Error(
+            f"CRM_RESPONSE_CACHE names {alias!r}, which is not in CACHES.",
+            id='crm.E001',
+        )]
+    if isinstance(cache, LocMemCache):
+        return [Warning(
+            f"CRM_RESPONSE_CACHE names {alias!r}, a per-process LocMemCache.",
+            hint=(
+                "Invalidation bumps counters in the cache, so other workers, cron jobs and "
+                "Celery tasks never see this process's writes, nor it theirs. Fine for a single "
+                "local process; use Redis, Memcached or the database cache anywhere else."
+            ),
+            id='crm.W001',
+        )]
+    return []
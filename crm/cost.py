@@ -0,0 +1,171 @@
+import threading
+
+from django.conf import settings
+from django.db.models import Model
+from graphene.relay import Connection
+from graphene_django.settings import graphene_settings
+from graphql import (
+    FieldNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    GraphQLList,
+    InlineFragmentNode,
+    get_named_type,
+    get_nullable_type,
+    is_composite_type,
+)
+from graphql.validation import ValidationRule
+
+# Relay plumbing between a connection and its nodes; free and flat
+WRAPPER_FIELDS = {'edges', 'node'}
+
+
+def is_connection(graphql_type):
+    graphene_type = getattr(get_named_type(graphql_type), 'graphene_type', None)
+    return isinstance(graphene_type, type) and issubclass(graphene_type, Connection)
+
+
+def is_list(graphql_type):
+    return isinstance(get_nullable_type(graphql_type), GraphQLList)
+
+
+class QueryCostRule(ValidationRule):
+    """Reject operations whose estimated cost or depth exceeds the budget
+
+    Cost estimates the objects an operation returns: every object field
+    costs 1 plus its selection, multiplied by `first`/`last` on
+    connections, otherwise by CRM_QUERY_DEFAULT_LIST_SIZE for root lists
+    and connections and by CRM_QUERY_NESTED_LIST_SIZE for those below the
+    root (a customer's orders, an order's items), capped by the connection
+    page limit. A connection's nodes are costed through its edges/node,
+    which add nothing themselves. Scalars are free. Depth counts object
+    levels, looking through edges/node.
+
+    Argument values may be variables, so the rule is bound to each
+    request's variables with for_request(), which also returns the dict
+    the estimate is written to.
+    """
+
+    variables = {}
+    operation_name = None
+    report = None
+
+    @classmethod
+    def for_request(cls, variables, operation_name):
+        report = {}
+        rule = type(cls.__name__, (cls,), {
+            'variables': variables or {},
+            'operation_name': operation_name,
+            'report': report,
+        })
+        return rule, report
+
+    def enter_operation_definition(self, node, *args):
+        if self.operation_name and (node.name is None or node.name.value != self.operation_name):
+            return
+        root_type = self.context.schema.get_root_type(node.operation)
+        if root_type is None:
+            return
+        cost, depth = self.selection_cost(root_type, node.selection_set, set(), nested=False)
+
+        max_depth = getattr(settings, 'CRM_QUERY_MAX_DEPTH', 10)
+        max_cost = getattr(settings, 'CRM_QUERY_MAX_COST', 50000)
+        self.report.update({'estimated': cost, 'depth': depth, 'max_cost': max_cost, 'max_depth': max_depth})
+        if depth > max_depth:
+            self.report_error(GraphQLError(
+                f"Query depth {depth} exceeds the limit of {max_depth}",
+                node, extensions={'code': 'QUERY_TOO_DEEP'},
+            ))
+        if cost > max_cost:
+            self.report_error(GraphQLError(
+                f"Query cost {cost} exceeds the limit of {max_cost}",
+                node, extensions={'code': 'QUERY_TOO_COMPLEX'},
+            ))
+
+    def iter_fields(self, parent_type, selection_set, visited):
+        """Yield (parent type, field node) for a selection set, expanding fragments"""
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                yield parent_type, selection
+            elif isinstance(selection, InlineFragmentNode):
+                condition = selection.type_condition
+                fragment_type = self.context.schema.get_type(condition.name.value) if condition else parent_type
+                yield from self.iter_fields(fragment_type, selection.selection_set, visited)
+            elif isinstance(selection, FragmentSpreadNode):
+                name = selection.name.value
+                fragment = self.context.get_fragment(name)
+                # A fragment cycle is reported by NoFragmentCyclesRule
+                if fragment is None or name in visited:
+                    continue
+                fragment_type = self.context.schema.get_type(fragment.type_condition.name.value)
+                yield from self.iter_fields(fragment_type, fragment.selection_set, visited | {name})
+
+    def selection_cost(self, parent_type, selection_set, visited, nested=True):
+        cost = depth = 0
+        if selection_set is None or not hasattr(parent_type, 'fields'):
+            return cost, depth
+        for field_parent, field_node in self.iter_fields(parent_type, selection_set, visited):
+            field_def = getattr(field_parent, 'fields', {}).get(field_node.name.value)
+            if field_def is None or not is_composite_type(get_named_type(field_def.type)):
+                depth = max(depth, 1)
+                continue
+            child_cost, child_depth = self.selection_cost(
+                get_named_type(field_def.type), field_node.selection_set, visited
+            )
+            if field_node.name.value in WRAPPER_FIELDS:
+                cost += child_cost
+                depth = max(depth, child_depth)
+                continue
+            cost += self.multiplier(field_def, field_node, nested) * (1 + child_cost)
+            depth = max(depth, 1 + child_depth)
+        return cost, depth
+
+    def multiplier(self, field_def, field_node, nested):
+        if nested:
+            default = getattr(settings, 'CRM_QUERY_NESTED_LIST_SIZE', 10)
+        else:
+            default = getattr(settings, 'CRM_QUERY_DEFAULT_LIST_SIZE', 100)
+        if is_connection(field_def.type):
+            limit = graphene_settings.RELAY_CONNECTION_MAX_LIMIT
+            sizes = [self.argument(field_node, name) for name in ('first', 'last')]
+            sizes = [size for size in sizes if isinstance(size, int)] or [default]
+            return min([limit, *sizes]) if limit else min(sizes)
+        if is_list(field_def.type):
+            return default
+        return 1
+
+    def argument(self, field_node, name):
+        for argument in field_node.arguments:
+            if argument.name.value != name:
+                continue
+            value = argument.value
+            if value.kind == 'variable':
+                return self.variables.get(value.name.value)
+            if value.kind == 'int_value':
+                return int(value.value)
+        return None
+
+
+class CostCounter:
+    """Execution middleware counting the model instances resolved: the actual cost
+
+    Root fields may resolve on several threads at once (AsyncGraphQLView),
+    so the count is updated under a lock.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, next, root, info, **args):
+        result = next(root, info, **args)
+        if isinstance(result, Model):
+            resolved = 1
+        elif isinstance(result, list):
+            resolved = sum(isinstance(item, Model) for item in result)
+        else:
+            return result
+        if resolved:
+            with self.lock:
+                self.count += resolved
+        return result
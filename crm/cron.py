@@ -1,17 +1,13 @@
 import os
 from datetime import datetime
-from gql.transport.requests import RequestsHTTPTransport
-from gql import gql, Client
+from crm.executor import get_executor
 
 def log_crm_heartbeat():
     log_file = "/tmp/crm_heartbeat_log.txt"
     now = datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
-    # Use gql to check GraphQL hello field
+    # Check the GraphQL hello field
     try:
-        transport = RequestsHTTPTransport(url="http://localhost:8000/graphql", verify=False)
-        client = Client(transport=transport, fetch_schema_from_transport=False)
-        query = gql('{ hello }')
-        result = client.execute(query)
+        result = get_executor().execute('{ hello }')
         hello = result.get("hello", "unavailable")
         msg = f"{now} CRM is alive (hello: {hello})\n"
     except Exception:
@@ -23,9 +19,7 @@ def update_low_stock():
     log_file = "/tmp/low_stock_updates_log.txt"
     now = datetime.now().strftime("%d/%m/%Y-%H:%M:%S")
     try:
-        transport = RequestsHTTPTransport(url="http://localhost:8000/graphql", verify=False)
-        client = Client(transport=transport, fetch_schema_from_transport=False)
-        mutation = gql('''
+        mutation = '''
             mutation {
                 updateLowStockProducts {
                     updatedProducts {
@@ -36,8 +30,8 @@ def update_low_stock():
                     message
                 }
             }
-        ''')
-        result = client.execute(mutation)
+        '''
+        result = get_executor().execute(mutation)
         updates = result.get("updateLowStockProducts", {})
         products = updates.get("updatedProducts", [])
         msg = f"{now} Restocked products:\n"
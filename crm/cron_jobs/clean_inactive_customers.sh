@@ -14,6 +14,7 @@ else
     cd "$cwd"
 fi
 
-COUNT=$(python3 manage.py shell -c "from crm.models import Customer; from django.utils import timezone; from datetime import timedelta; cutoff = timezone.now() - timedelta(days=365); qs = Customer.objects.filter(orders__isnull=True) | Customer.objects.exclude(orders__order_date__gte=cutoff); to_delete = qs.distinct(); deleted = to_delete.count(); to_delete.delete(); print(deleted)")
+# Deletes in short batches; the last line of output is the summary
+SUMMARY=$(python3 manage.py clean_inactive_customers --days 365 --batch-size 1000 --sleep 0.1 | tail -n 1)
 
-echo "$TIMESTAMP - Deleted $COUNT inactive customers" >> "$LOG_FILE"
+echo "$TIMESTAMP - $SUMMARY" >> "$LOG_FILE"
@@ -1,52 +1,26 @@
 #!/usr/bin/env python3
 import sys
 import os
-from datetime import datetime, timedelta
-import requests
 
-try:
-    from gql import gql, Client
-    from gql.transport.requests import RequestsHTTPTransport
-except ImportError:
-    print("The 'gql' library is required. Install it with: pip install gql[requests]")
-    sys.exit(1)
+# Run against the project in-process: no web server or HTTP round trip needed
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "alx_backend_graphql_crm.settings")
 
-LOG_FILE = "/tmp/order_reminders_log.txt"
-GRAPHQL_ENDPOINT = "http://localhost:8000/graphql"
+import django  # noqa: E402
 
-# Calculate date range for the last 7 days
-now = datetime.now()
-week_ago = now - timedelta(days=7)
+django.setup()
 
-# GraphQL query for orders in the last week
-query = gql('''
-query($dateGte: DateTime!) {
-  orders(filter: {orderDateGte: $dateGte}) {
-    id
-    orderDate
-    customer {
-      email
-    }
-  }
-}
-''')
+from crm.reminders import send_order_reminders  # noqa: E402
 
-transport = RequestsHTTPTransport(url=GRAPHQL_ENDPOINT, verify=False)
-client = Client(transport=transport, fetch_schema_from_transport=False)
+LOG_FILE = "/tmp/order_reminders_log.txt"
+CHECKPOINT_FILE = "/tmp/order_reminders_checkpoint.json"
 
 try:
-    variables = {"dateGte": week_ago.isoformat()}
-    result = client.execute(query, variable_values=variables)
-    orders = result.get("orders", [])
+    # Orders of the last 7 days, one reminder per customer, in keyset chunks
+    sent = send_order_reminders(LOG_FILE, CHECKPOINT_FILE, days=7)
 except Exception as e:
-    print(f"GraphQL query failed: {e}")
+    print(f"Order reminders failed: {e}")
     sys.exit(1)
 
-with open(LOG_FILE, "a") as f:
-    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
-    for order in orders:
-        order_id = order.get("id")
-        customer_email = order.get("customer", {}).get("email", "N/A")
-        f.write(f"{timestamp} - Order ID: {order_id}, Customer Email: {customer_email}\n")
-
-print("Order reminders processed!")
+print(f"Order reminders processed! ({sent} sent)")
@@ -0,0 +1,87 @@
+import threading
+
+from django.conf import settings
+from django.http import HttpRequest
+from graphene_django.settings import graphene_settings
+
+
+class GraphQLExecutionError(Exception):
+    """Raised when a GraphQL document comes back with errors"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(str(error) for error in errors))
+
+
+class LocalExecutor:
+    """Run GraphQL documents through the project schema in this process
+
+    Background jobs get the same documents, resolvers and validation as
+    the API, without an HTTP round trip or a running web server.
+    """
+
+    def execute(self, query, variables=None, operation_name=None):
+        result = graphene_settings.SCHEMA.execute(
+            query,
+            variable_values=variables,
+            operation_name=operation_name,
+            # A fresh request per run, so per-request loaders are not shared
+            context_value=HttpRequest(),
+        )
+        if result.errors:
+            raise GraphQLExecutionError(result.errors)
+        return result.data
+
+
+class RemoteExecutor:
+    """Send GraphQL documents to a remote endpoint over one pooled HTTP session"""
+
+    def __init__(self, url, timeout=None):
+        from gql import Client
+        from gql.transport.requests import RequestsHTTPTransport
+
+        self.client = Client(
+            transport=RequestsHTTPTransport(url=url, timeout=timeout),
+            fetch_schema_from_transport=False,
+        )
+        self.session = None
+        self.lock = threading.Lock()
+
+    def execute(self, query, variables=None, operation_name=None):
+        from gql import GraphQLRequest
+        from gql.transport.exceptions import TransportQueryError
+
+        request = GraphQLRequest(query, variable_values=variables, operation_name=operation_name)
+        # requests sessions are not thread-safe; serialise calls on the shared one
+        with self.lock:
+            if self.session is None:
+                self.session = self.client.connect_sync()
+            try:
+                return self.session.execute(request)
+            except TransportQueryError as e:
+                raise GraphQLExecutionError(e.errors or [e])
+
+    def close(self):
+        with self.lock:
+            if self.session is not None:
+                self.client.close_sync()
+                self.session = None
+
+
+_executor = None
+
+
+def get_executor():
+    """Return the process-wide executor
+
+    Documents run in-process unless CRM_GRAPHQL_REMOTE_URL names an
+    endpoint, in which case they go to it over a shared HTTP session.
+    """
+    global _executor
+    if _executor is None:
+        url = getattr(settings, 'CRM_GRAPHQL_REMOTE_URL', None)
+        if url:
+            _executor = RemoteExecutor(url, getattr(settings, 'CRM_GRAPHQL_REMOTE_TIMEOUT', 30))
+        else:
+            _executor = LocalExecutor()
+    return _executor
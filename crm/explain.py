@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+import django_filters
+from django.db import connection
+from django.utils import timezone
+
+from .filters import CustomerFilter, OrderFilter, ProductFilter
+
+FILTERSETS = [CustomerFilter, ProductFilter, OrderFilter]
+
+# Filters allowed to scan a table. A leading-wildcard icontains can't use a
+# B-tree index on any backend; these substring filters are kept for API
+# compatibility, and `search` on the same filterset is their indexed
+# replacement.
+SCAN_ALLOWED = {
+    'CustomerFilter.name',
+    'CustomerFilter.email',
+    'ProductFilter.name',
+    'OrderFilter.customer_name',
+    'OrderFilter.customer_email',
+}
+
+
+def sample_value(filter_):
+    """A representative value for a filter, used only to build its query"""
+    if isinstance(filter_, django_filters.BooleanFilter):
+        return True
+    if isinstance(filter_, django_filters.DateTimeFilter):
+        return timezone.now() - timedelta(days=1)
+    if isinstance(filter_, django_filters.NumberFilter):
+        return 5
+    return 'abc'
+
+
+def uses_index(plan):
+    """Whether every table in an EXPLAIN plan is reached through an index
+
+    Returns None for backends whose plans we don't know how to read.
+    """
+    if connection.vendor == 'postgresql':
+        return 'Seq Scan' not in plan
+    if connection.vendor == 'sqlite':
+        # FTS5 lookups show up as 'SCAN <table> VIRTUAL TABLE INDEX'
+        return all(
+            'USING' in line or 'VIRTUAL TABLE INDEX' in line
+            for line in plan.splitlines() if 'SCAN' in line
+        )
+    return None
+
+
+def filter_plans():
+    """Yield (label, plan) for every filter in crm/filters.py"""
+    for filterset_class in FILTERSETS:
+        model = filterset_class._meta.model
+        for name, filter_ in filterset_class.base_filters.items():
+            filterset = filterset_class(data={name: sample_value(filter_)}, queryset=model.objects.all())
+            yield f"{filterset_class.__name__}.{name}", filterset.qs.explain()
@@ -0,0 +1,170 @@
+import base64
+import json
+from functools import partial
+
+import graphene
+from django.db.models import Q
+from graphene_django import DjangoConnectionField
+from graphene_django.filter import DjangoFilterConnectionField
+from graphql import GraphQLError
+
+from .filtering import compile_filterset
+from .loaders import get_loaders
+from .optimizer import optimize_queryset
+
+
+class BatchedFilterConnectionField(DjangoFilterConnectionField):
+    """Filter connection whose nodes are batch-loaded through the request loaders"""
+
+    @classmethod
+    def resolve_queryset(
+        cls, connection, iterable, info, args, filtering_args, filterset_class
+    ):
+        if isinstance(iterable, list):
+            # Lists come from a relation loader; only fall back to the
+            # database when the client actually asked for filtering.
+            if not any(args.get(name) is not None for name in filtering_args):
+                return iterable
+            model = connection._meta.node._meta.model
+            iterable = model._default_manager.filter(pk__in=[obj.pk for obj in iterable])
+        queryset = cls.filter_queryset(
+            connection, iterable, info, args, filtering_args, filterset_class
+        )
+        return optimize_queryset(queryset, info)
+
+    @classmethod
+    def filter_queryset(cls, connection, iterable, info, args, filtering_args, filterset_class):
+        """Apply the filter arguments through the FilterSet's compiled plan"""
+        queryset = DjangoConnectionField.resolve_queryset(connection, iterable, info, args)
+        values = {name: value for name, value in args.items() if name in filtering_args}
+        return compile_filterset(filterset_class).apply(queryset, values)
+
+    @classmethod
+    def connection_resolver(cls, resolver, connection, default_manager, queryset_resolver,
+                            max_limit, enforce_first_or_last, root, info, **args):
+        result = super().connection_resolver(
+            resolver, connection, default_manager, queryset_resolver,
+            max_limit, enforce_first_or_last, root, info, **args
+        )
+        get_loaders(info).prime(edge.node for edge in result.edges)
+        return result
+
+
+class KeysetConnection(graphene.relay.Connection):
+    """Connection whose total count is only computed when the client selects it"""
+
+    class Meta:
+        abstract = True
+
+    total_count = graphene.Int()
+
+    def resolve_total_count(self, info):
+        return self.iterable.count()
+
+
+_keyset_connections = {}
+
+
+def get_keyset_connection(node_type):
+    if node_type not in _keyset_connections:
+        _keyset_connections[node_type] = KeysetConnection.create_type(
+            f"{node_type._meta.name}KeysetConnection", node=node_type
+        )
+    return _keyset_connections[node_type]
+
+
+class KeysetConnectionField(BatchedFilterConnectionField):
+    """Filter connection paginated on an (ordering field, id) keyset instead of offsets
+
+    Cursors encode the last seen ordering values, so every page is an index
+    range scan no matter how deep it is, and no COUNT(*) runs unless
+    totalCount is selected.
+    """
+
+    def __init__(self, type_, *args, ordering=('created_at', 'id'), **kwargs):
+        self.ordering = ordering
+        super().__init__(type_, *args, **kwargs)
+        # Offsets are exactly what keyset pagination avoids
+        self._base_args.pop('offset', None)
+
+    @property
+    def type(self):
+        return get_keyset_connection(super().type._meta.node)
+
+    def encode_cursor(self, node):
+        values = [getattr(node, name) for name in self.ordering]
+        payload = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            opts = self.model._meta
+            return [opts.get_field(name).to_python(value) for name, value in zip(self.ordering, values, strict=True)]
+        except Exception:
+            raise GraphQLError(f"Invalid cursor: {cursor}")
+
+    def keyset_filter(self, cursor, lookup):
+        """Q selecting rows strictly after (gt) or before (lt) the cursor"""
+        values = self.decode_cursor(cursor)
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            # Equal on every earlier column, strictly past the cursor on this one
+            term = Q(**dict(zip(self.ordering[:index], values)), **{f'{name}__{lookup}': values[index]})
+            condition |= term
+        return condition
+
+    def paginate(self, queryset, args):
+        first, last = args.get('first'), args.get('last')
+        after, before = args.get('after'), args.get('before')
+        if first is not None and last is not None:
+            raise GraphQLError("Use either first or last, not both")
+
+        limit = first if first is not None else last
+        if limit is None:
+            limit = self.max_limit or 100
+        if limit < 0 or (self.max_limit and limit > self.max_limit):
+            raise GraphQLError(f"Page size must be between 0 and {self.max_limit}")
+
+        page = queryset
+        if after:
+            page = page.filter(self.keyset_filter(after, 'gt'))
+        if before:
+            page = page.filter(self.keyset_filter(before, 'lt'))
+
+        backwards = last is not None
+        order = [f'-{name}' for name in self.ordering] if backwards else list(self.ordering)
+        nodes = list(page.order_by(*order)[:limit + 1])
+        has_more = len(nodes) > limit
+        nodes = nodes[:limit]
+        if backwards:
+            nodes.reverse()
+
+        connection_type = self.connection_type
+        edges = [connection_type.Edge(node=node, cursor=self.encode_cursor(node)) for node in nodes]
+        connection = connection_type(
+            edges=edges,
+            page_info=graphene.relay.PageInfo(
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+                has_previous_page=has_more if backwards else bool(after),
+                has_next_page=bool(before) if backwards else has_more,
+            ),
+        )
+        connection.iterable = queryset
+        return connection
+
+    def keyset_resolver(self, resolver, root, info, **args):
+        iterable = resolver(root, info, **args)
+        if iterable is None:
+            iterable = self.get_manager()
+        queryset = self.filter_queryset(
+            self.connection_type, iterable, info, args,
+            filtering_args=self.filtering_args, filterset_class=self.filterset_class
+        )
+        connection = self.paginate(optimize_queryset(queryset, info, self.ordering), args)
+        get_loaders(info).prime(edge.node for edge in connection.edges)
+        return connection
+
+    def wrap_resolve(self, parent_resolver):
+        return partial(self.keyset_resolver, self.resolver or parent_resolver)
@@ -0,0 +1,117 @@
+from functools import lru_cache
+
+import django_filters
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from django_filters.constants import EMPTY_VALUES
+from graphene_django.filter.fields import convert_enum
+
+
+def is_plain(filter_):
+    """Whether a filter is a bare `field__lookup=value` that fits in a Q"""
+    return filter_.method is None and type(filter_).filter is django_filters.Filter.filter
+
+
+def spans_many(model, field_name):
+    """Whether a lookup path crosses a one-to-many or many-to-many relation"""
+    for part in field_name.split('__'):
+        field = model._meta.get_field(part)
+        if field.one_to_many or field.many_to_many:
+            return True
+        if not field.is_relation:
+            return False
+        model = field.related_model
+    return False
+
+
+class CompiledFilter:
+    """A FilterSet flattened into a lookup plan, built once per FilterSet class
+
+    Plain filters become one Q tree; `method=` filters are called directly
+    on a shared FilterSet instance; anything else (choice, range, ordering
+    filters...) goes through a real FilterSet, restricted to those inputs.
+    Values are expected to be already typed, as GraphQL arguments are, so
+    no form validation runs.
+    """
+
+    def __init__(self, filterset_class):
+        self.filterset_class = filterset_class
+        self.model = filterset_class._meta.model
+        self.filterset = filterset_class(queryset=self.model._default_manager.none())
+        self.lookups = {}
+        self.methods = {}
+        self.fallback = set()
+        # Joins that can repeat rows and so need DISTINCT
+        self.many = set()
+
+        for name, filter_ in filterset_class.base_filters.items():
+            if is_plain(filter_):
+                self.lookups[name] = (f'{filter_.field_name}__{filter_.lookup_expr}', filter_.exclude)
+                if filter_.distinct or spans_many(self.model, filter_.field_name):
+                    self.many.add(name)
+            elif filter_.method is not None:
+                self.methods[name] = (getattr(self.filterset, filter_.method), filter_.field_name)
+            else:
+                self.fallback.add(name)
+
+    def q(self, values):
+        """The Q tree for the plain filters among values"""
+        condition = Q()
+        for name, value in values.items():
+            if name in self.lookups and value not in EMPTY_VALUES:
+                lookup, exclude = self.lookups[name]
+                term = Q(**{lookup: convert_enum(value)})
+                condition &= ~term if exclude else term
+        return condition
+
+    def apply(self, queryset, values):
+        """Filter queryset by values (filter name -> value)"""
+        queryset = queryset.filter(self.q(values))
+        if any(name in self.many and values[name] not in EMPTY_VALUES for name in values):
+            queryset = queryset.distinct()
+
+        fallback = {name: values[name] for name in self.fallback & set(values)}
+        if fallback:
+            filterset = self.filterset_class(data=fallback, queryset=queryset)
+            if not filterset.is_valid():
+                raise ValidationError(filterset.form.errors.as_json())
+            queryset = filterset.qs
+
+        for name, (method, field_name) in self.methods.items():
+            value = values.get(name)
+            if value not in EMPTY_VALUES:
+                queryset = method(queryset, field_name, convert_enum(value))
+        return queryset
+
+
+@lru_cache(maxsize=None)
+def compile_filterset(filterset_class):
+    """The shared CompiledFilter for a FilterSet class"""
+    return CompiledFilter(filterset_class)
+
+
+class InputFilter:
+    """Maps a GraphQL *FilterInput type onto a FilterSet's compiled plan
+
+    Built when the schema is, and fails then if an input field has no
+    filter to map onto.
+    """
+
+    def __init__(self, input_type, filterset_class, aliases=None):
+        self.compiled = compile_filterset(filterset_class)
+        # Input field name -> filter name, for inputs named differently from the FilterSet
+        self.names = {}
+        for field_name in input_type._meta.fields:
+            name = (aliases or {}).get(field_name, field_name)
+            if name not in filterset_class.base_filters:
+                raise ImproperlyConfigured(
+                    f"{input_type.__name__}.{field_name} has no filter in {filterset_class.__name__}"
+                )
+            self.names[field_name] = name
+
+    def apply(self, queryset, filter_input):
+        if not filter_input:
+            return queryset
+        return self.compiled.apply(
+            queryset, {self.names[name]: value for name, value in filter_input.items()}
+        )
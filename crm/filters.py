@@ -1,6 +1,7 @@
 import django_filters
 from django.db.models import Q
-from .models import Customer, Product, Order
+from .models import Customer, Product, Order, OrderItem
+from .search import get_search_backend
 
 
 class CustomerFilter(django_filters.FilterSet):
@@ -15,9 +16,12 @@ class CustomerFilter(django_filters.FilterSet):
     # Custom filter for phone starts with specific pattern
     phone_starts_with = django_filters.CharFilter(field_name='phone', lookup_expr='startswith')
 
+    # Ranked full-text search over name and email
+    search = django_filters.CharFilter(method='filter_search')
+
     class Meta:
         model = Customer
-        fields = ['name', 'email', 'created_at_gte', 'created_at_lte', 'phone_pattern', 'phone_starts_with']
+        fields = ['name', 'email', 'created_at_gte', 'created_at_lte', 'phone_pattern', 'phone_starts_with', 'search']
 
     def filter_phone_pattern(self, queryset, name, value):
         """Custom filter for phone pattern matching"""
@@ -25,6 +29,12 @@ class CustomerFilter(django_filters.FilterSet):
             return queryset.filter(phone__startswith=value)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """Ranked search, best matches first"""
+        if value:
+            return get_search_backend().search(queryset, value)
+        return queryset
+
 
 class ProductFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
@@ -37,9 +47,12 @@ class ProductFilter(django_filters.FilterSet):
     # Custom filter for low stock products
     low_stock = django_filters.BooleanFilter(method='filter_low_stock')
 
+    # Ranked full-text search over name
+    search = django_filters.CharFilter(method='filter_search')
+
     class Meta:
         model = Product
-        fields = ['name', 'price_gte', 'price_lte', 'stock_gte', 'stock_lte', 'stock', 'low_stock']
+        fields = ['name', 'price_gte', 'price_lte', 'stock_gte', 'stock_lte', 'stock', 'low_stock', 'search']
 
     def filter_low_stock(self, queryset, name, value):
         """Filter products with stock less than 10"""
@@ -47,6 +60,12 @@ class ProductFilter(django_filters.FilterSet):
             return queryset.filter(stock__lt=10)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        """Ranked search, best matches first"""
+        if value:
+            return get_search_backend().search(queryset, value)
+        return queryset
+
 
 class OrderFilter(django_filters.FilterSet):
     total_amount_gte = django_filters.NumberFilter(field_name='total_amount', lookup_expr='gte')
@@ -57,19 +76,57 @@ class OrderFilter(django_filters.FilterSet):
     # Filter by customer name (related field lookup)
     customer_name = django_filters.CharFilter(field_name='customer__name', lookup_expr='icontains')
     
-    # Filter by product name (related field lookup through ManyToMany)
-    product_name = django_filters.CharFilter(field_name='products__name', lookup_expr='icontains')
+    # Filter by product name (a subquery over the order items, so no DISTINCT)
+    product_name = django_filters.CharFilter(method='filter_product_name')
     
     # Filter orders that include a specific product ID
-    product_id = django_filters.NumberFilter(field_name='products__id', lookup_expr='exact')
+    product_id = django_filters.NumberFilter(method='filter_product_id')
     
     # Filter by customer email
     customer_email = django_filters.CharFilter(field_name='customer__email', lookup_expr='icontains')
 
+    # Full-text search over the customer's name/email and the ordered products' names
+    search = django_filters.CharFilter(method='filter_search')
+
     class Meta:
         model = Order
         fields = [
             'total_amount_gte', 'total_amount_lte', 
             'order_date_gte', 'order_date_lte',
-            'customer_name', 'product_name', 'product_id', 'customer_email'
-        ]
\ No newline at end of file
+            'customer_name', 'product_name', 'product_id', 'customer_email',
+            'search'
+        ]
+
+    def filter_items(self, queryset, **lookups):
+        """Orders with at least one item matching lookups, as a semi-join
+
+        Joining through the items would repeat each order once per matching
+        item and need a DISTINCT over every column to undo it. An IN
+        subquery never repeats rows, and unlike a correlated EXISTS it lets
+        SQLite start from the matching items instead of probing every order
+        (PostgreSQL plans both as the same semi-join).
+        """
+        return queryset.filter(pk__in=OrderItem.objects.filter(**lookups).values('order_id'))
+
+    def filter_product_name(self, queryset, name, value):
+        if value:
+            return self.filter_items(queryset, product__name__icontains=value)
+        return queryset
+
+    def filter_product_id(self, queryset, name, value):
+        if value is not None:
+            return self.filter_items(queryset, product_id=value)
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Orders whose customer or any of whose products match the search"""
+        if not value:
+            return queryset
+        backend = get_search_backend()
+        customers = backend.search(Customer.objects.all(), value).order_by().values('pk')
+        products = backend.search(Product.objects.all(), value).order_by().values('pk')
+        # Two primary-key IN lists keep both branches on an index
+        return queryset.filter(
+            Q(pk__in=Order.objects.filter(customer__in=customers).values('pk'))
+            | Q(pk__in=OrderItem.objects.filter(product__in=products).values('order_id'))
+        )
\ No newline at end of file
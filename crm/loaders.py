@@ -0,0 +1,124 @@
+from collections import defaultdict
+
+from django.db.models import F
+
+
+class RelationLoader:
+    """Batch-load one relation of a model for every instance in a batch"""
+
+    def __init__(self, loaders, model, name):
+        self.loaders = loaders
+        self.name = name
+        self.field = model._meta.get_field(name)
+        self.related_model = self.field.related_model
+        # Forward foreign keys are keyed on the FK column, everything else
+        # (reverse FK, both sides of M2M) on the instance primary key.
+        self.is_single = self.field.many_to_one
+        self.cache = {}
+
+    def get_key(self, instance):
+        if self.is_single:
+            return getattr(instance, self.field.attname)
+        return instance.pk
+
+    def get_queryset(self):
+        return self.related_model._default_manager.all()
+
+    def fetch(self, keys):
+        """Load the relation for all keys with a single query"""
+        if self.is_single:
+            objects = self.get_queryset().in_bulk(keys)
+            return {key: objects.get(key) for key in keys}
+
+        # The remote side's query name lets us filter the target model by the
+        # source keys and tag each row with the key it was loaded for.
+        query_name = self.field.remote_field.name
+        queryset = self.get_queryset().filter(
+            **{f'{query_name}__in': keys}
+        ).annotate(_loader_key=F(query_name))
+        grouped = defaultdict(list)
+        for obj in queryset:
+            grouped[obj._loader_key].append(obj)
+        return {key: grouped[key] for key in keys}
+
+    def get_cached(self, instance):
+        """Return a value already fetched by select_related/prefetch_related"""
+        if self.is_single:
+            if self.field.is_cached(instance):
+                return True, self.field.get_cached_value(instance)
+            return False, None
+        prefetched = getattr(instance, '_prefetched_objects_cache', {})
+        if self.name in prefetched:
+            return True, list(prefetched[self.name])
+        return False, None
+
+    def load(self, instance):
+        found, value = self.get_cached(instance)
+        if found:
+            return value
+
+        key = self.get_key(instance)
+        if key is None:
+            return None if self.is_single else []
+
+        if key not in self.cache:
+            batch = self.loaders.get_batch(instance)
+            keys = {self.get_key(obj) for obj in batch}
+            keys = [k for k in keys if k is not None and k not in self.cache]
+            results = self.fetch(keys)
+            self.cache.update(results)
+
+            # Everything loaded here forms the batch for the next level down
+            loaded = []
+            for value in results.values():
+                if self.is_single:
+                    if value is not None:
+                        loaded.append(value)
+                else:
+                    loaded.extend(value)
+            self.loaders.prime(loaded)
+
+        return self.cache[key]
+
+
+class Loaders:
+    """Per-request registry of relation loaders and instance batches"""
+
+    def __init__(self):
+        self._loaders = {}
+        self._batches = {}
+
+    def prime(self, instances):
+        """Group instances so relation lookups on one load for all of them"""
+        batch = list(instances)
+        for instance in batch:
+            # Keep the first (widest) batch an instance was seen in
+            self._batches.setdefault(id(instance), batch)
+        return batch
+
+    def get_batch(self, instance):
+        return self._batches.get(id(instance), [instance])
+
+    def get_loader(self, model, name):
+        key = (model, name)
+        if key not in self._loaders:
+            self._loaders[key] = RelationLoader(self, model, name)
+        return self._loaders[key]
+
+    def load(self, instance, name):
+        return self.get_loader(type(instance), name).load(instance)
+
+
+def get_loaders(info):
+    """Return the loaders attached to the current request, creating them once"""
+    context = info.context
+    loaders = getattr(context, '_crm_loaders', None)
+    if loaders is None:
+        loaders = Loaders()
+        try:
+            context._crm_loaders = loaders
+        except AttributeError:
+            # No request object to hang the cache on (e.g. schema.execute()
+            # without a context): loads still work, just without batching.
+            pass
+    return loaders
@@ -0,0 +1,94 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from crm.models import Customer, Order, Product
+
+CREATE_ORDER = '''
+mutation($customerId: Int!, $productId: Int!, $quantity: Int!) {
+  createOrder(customerId: $customerId, items: [{productId: $productId, quantity: $quantity}]) {
+    success
+    message
+    errors { message }
+  }
+}
+'''
+
+
+class Command(BaseCommand):
+    help = "Fire many concurrent createOrder mutations at one hot product and check for overselling"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=500, help="Starting stock of the hot product")
+        parser.add_argument('--orders', type=int, default=1000, help="Number of createOrder calls")
+        parser.add_argument('--workers', type=int, default=16, help="Parallel worker threads")
+        parser.add_argument('--quantity', type=int, default=1, help="Units per order")
+
+    def handle(self, *args, **options):
+        # Imported here so the schema is only built once Django is ready
+        from schema import schema
+
+        customer = Customer.objects.create(name="Benchmark", email=f"benchmark-{time.time_ns()}@example.com")
+        product = Product.objects.create(name="Benchmark hot product", price="1.00", stock=options['stock'])
+        variables = {
+            'customerId': customer.pk,
+            'productId': product.pk,
+            'quantity': options['quantity'],
+        }
+
+        reasons = Counter()
+
+        def place_order(_):
+            try:
+                result = schema.execute(CREATE_ORDER, variable_values=variables)
+                if result.errors:
+                    reasons[str(result.errors[0])] += 1
+                    return 'error'
+                response = result.data['createOrder']
+                if response['success']:
+                    return 'ok'
+                if response['message'] == "Insufficient stock":
+                    return 'rejected'
+                # Only a stock shortage is an expected rejection; anything
+                # else (e.g. "database is locked") is a failed run
+                reasons[response['errors'][0]['message'] if response['errors'] else response['message']] += 1
+                return 'failed'
+            finally:
+                # Each worker thread opened its own connection
+                connection.close()
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                outcomes = list(pool.map(place_order, range(options['orders'])))
+            elapsed = time.perf_counter() - started
+
+            product.refresh_from_db()
+            placed = outcomes.count('ok')
+            sold = Order.objects.filter(customer=customer).count() * options['quantity']
+            oversold = sold > options['stock'] or product.stock != options['stock'] - sold
+
+            self.stdout.write(
+                f"{options['orders']} orders from {options['workers']} workers in {elapsed:.2f}s "
+                f"({options['orders'] / elapsed:.0f} orders/s)\n"
+                f"  placed: {placed}, rejected for stock: {outcomes.count('rejected')}, "
+                f"failed: {outcomes.count('failed')}, errors: {outcomes.count('error')}\n"
+                f"  units sold: {sold}, stock left: {product.stock}"
+            )
+        finally:
+            customer.delete()
+            product.delete()
+
+        if oversold:
+            raise CommandError("Stock is inconsistent with placed orders")
+        failed = outcomes.count('failed') + outcomes.count('error')
+        if failed:
+            reason, count = reasons.most_common(1)[0]
+            raise CommandError(
+                f"{failed} orders failed for reasons other than stock ({count} with {reason!r}); "
+                f"the run proves nothing"
+            )
+        self.stdout.write(self.style.SUCCESS("No overselling"))
@@ -0,0 +1,108 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from crm.filters import OrderFilter
+from crm.models import Customer, Order, OrderItem, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the productName filter on orders as JOIN + DISTINCT, correlated EXISTS "
+        "and the semi-join OrderFilter uses. Seed 1M orders x 5 products with --seed 1000000; "
+        "seeded runs use a throwaway test database, never the configured one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Insert this many orders into a throwaway test database and time that")
+        parser.add_argument('--products-per-order', type=int, default=5)
+        parser.add_argument('--products', type=int, default=1000,
+                            help="Size of the product catalogue the seeded orders draw from")
+        parser.add_argument('--term', default='Product 12',
+                            help="productName value to filter on")
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Runs per query; the fastest is reported")
+
+    def seed(self, count, per_order, catalogue, chunk_size=10000):
+        products = Product.objects.bulk_create([
+            Product(name=f"Product {i}", price=Decimal(random.randint(100, 100000)) / 100, stock=1000)
+            for i in range(catalogue)
+        ])
+        customers = Customer.objects.bulk_create([
+            Customer(name=f"Customer {i}", email=f"bench-{time.time_ns()}-{i}@example.com")
+            for i in range(max(1, count // 10))
+        ])
+        for start in range(0, count, chunk_size):
+            size = min(chunk_size, count - start)
+            with transaction.atomic():
+                orders = Order.objects.bulk_create([
+                    Order(customer=random.choice(customers)) for _ in range(size)
+                ])
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, product=product, unit_price=product.price)
+                    for order in orders
+                    for product in random.sample(products, per_order)
+                ])
+            self.stdout.write(f"Seeded {start + size}/{count} orders")
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def best_time(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = run()
+            timings.append(time.perf_counter() - start)
+        return min(timings), result
+
+    def handle(self, *args, **options):
+        if not options['seed']:
+            return self.benchmark(options)
+
+        # Created, migrated and destroyed like the test runner's database
+        # (test_<NAME>, or in memory on SQLite); the configured one is never written
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.seed(options['seed'], options['products_per_order'], options['products'])
+            self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, options):
+        term = options['term']
+        items = OrderItem.objects.filter(order=OuterRef('pk'), product__name__icontains=term)
+        queries = {
+            'join + distinct': Order.objects.filter(products__name__icontains=term).distinct(),
+            'exists': Order.objects.filter(Exists(items)),
+            'OrderFilter': OrderFilter(data={'product_name': term}, queryset=Order.objects.all()).qs,
+        }
+        self.stdout.write(
+            f"{Order.objects.count()} orders, {OrderItem.objects.count()} items, productName={term!r}"
+        )
+
+        results = {}
+        for label, queryset in queries.items():
+            # The two queries a connection page runs: the total, and the page of full rows
+            count_time, count = self.best_time(options['repeat'], queryset.count)
+            page_time, page = self.best_time(
+                options['repeat'],
+                lambda: [order.pk for order in queryset.order_by('-order_date', '-id')[:100]],
+            )
+            results[label] = (count, page, count_time + page_time)
+            self.stdout.write(
+                f"{label:>16}: count {count} in {count_time * 1000:.1f} ms, "
+                f"first 100 rows in {page_time * 1000:.1f} ms"
+            )
+
+        if len({(count, tuple(page)) for count, page, _ in results.values()}) > 1:
+            raise CommandError("The queries returned different orders")
+        baseline = results['join + distinct'][2]
+        for label, (_, _, total) in results.items():
+            self.stdout.write(f"{label:>16}: {baseline / total:.1f}x the JOIN + DISTINCT speed")
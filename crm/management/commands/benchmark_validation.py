@@ -0,0 +1,76 @@
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.validation import customer_errors, validate_email, validate_phone
+
+EMAILS = ['ada@example.com', 'grace.hopper@navy.mil', 'not-an-email', 'x@y', 'first.last+tag@sub.example.org']
+PHONES = [None, '', '+15551234567', '555-123-4567', '(555) 123-4567', '12345', 'call me']
+
+
+def legacy_errors(emails, phones):
+    """Row by row with pattern strings, as CreateCustomer used to validate"""
+    results = []
+    for email, phone in zip(emails, phones):
+        errors = []
+        if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email or ''):
+            errors.append(('email', "Invalid email format"))
+        if phone:
+            phone_clean = re.sub(r'[^\d+\-]', '', phone)
+            if not re.match(r'^\+?1?\d{9,15}$|^\d{3}-\d{3}-\d{4}$', phone_clean):
+                errors.append(('phone', "Invalid phone number format"))
+        results.append(tuple(errors))
+    return results
+
+
+def per_row_errors(emails, phones):
+    """Row by row with the precompiled validators"""
+    results = []
+    for email, phone in zip(emails, phones):
+        errors = []
+        if not validate_email(email or ''):
+            errors.append(('email', "Invalid email format"))
+        if not validate_phone(phone):
+            errors.append(('phone', "Invalid phone number format"))
+        results.append(tuple(errors))
+    return results
+
+
+class Command(BaseCommand):
+    help = "Time customer email and phone validation: pattern strings, precompiled, and column batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=3,
+                            help="Runs per strategy; the fastest is reported")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        rng = random.Random(0)
+        emails = [rng.choice(EMAILS) for _ in range(rows)]
+        phones = [rng.choice(PHONES) for _ in range(rows)]
+
+        strategies = {
+            'pattern strings': legacy_errors,
+            'precompiled': per_row_errors,
+            'batch': customer_errors,
+        }
+        results = {}
+        for label, validate in strategies.items():
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                result = validate(emails, phones)
+                timings.append(time.perf_counter() - start)
+            results[label] = (min(timings), result)
+            self.stdout.write(
+                f"{label:>16}: {min(timings):.2f}s, {rows / min(timings):,.0f} rows/s"
+            )
+
+        if len({repr(result) for _, result in results.values()}) > 1:
+            raise CommandError("The strategies disagree")
+        baseline = results['pattern strings'][0]
+        for label, (elapsed, _) in results.items():
+            self.stdout.write(f"{label:>16}: {baseline / elapsed:.1f}x the pattern-string speed")
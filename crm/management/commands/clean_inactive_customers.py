@@ -0,0 +1,79 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from crm.models import Customer, Order, OrderItem
+
+
+def inactive_customers(cutoff):
+    """Customers with no order since cutoff, as one NOT EXISTS anti-join"""
+    recent_orders = Order.objects.filter(customer=OuterRef('pk'), order_date__gte=cutoff)
+    return Customer.objects.filter(~Exists(recent_orders))
+
+
+class Command(BaseCommand):
+    help = "Delete customers with no orders in the past year, in small batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365,
+                            help="Customers without an order in this many days are inactive")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Customers deleted per transaction")
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help="Seconds to pause between batches so other writers get the database")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only count the customers that would be deleted")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1")
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        dry_run = options['dry_run']
+
+        customers = deleted_orders = deleted_items = 0
+        last_pk = 0
+        start = time.monotonic()
+        while True:
+            # Walk primary keys upwards so every batch is an index range, not a rescan
+            batch = list(
+                inactive_customers(cutoff).filter(pk__gt=last_pk)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+
+            batch_start = time.monotonic()
+            if dry_run:
+                count = len(batch)
+            else:
+                with transaction.atomic():
+                    # Re-check inside the transaction: a customer may have ordered since
+                    _, per_model = inactive_customers(cutoff).filter(pk__in=batch).delete()
+                count = per_model.get(Customer._meta.label, 0)
+                deleted_orders += per_model.get(Order._meta.label, 0)
+                deleted_items += per_model.get(OrderItem._meta.label, 0)
+            customers += count
+
+            elapsed = time.monotonic() - batch_start
+            self.stdout.write(
+                f"{'Found' if dry_run else 'Deleted'} {count} customers in {elapsed:.2f}s "
+                f"({customers} total, {customers / (time.monotonic() - start):.0f}/s)"
+            )
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        elapsed = time.monotonic() - start
+        rate = customers / elapsed if elapsed else 0
+        if dry_run:
+            self.stdout.write(f"Would delete {customers} inactive customers ({elapsed:.2f}s)")
+        else:
+            self.stdout.write(
+                f"Deleted {customers} inactive customers, {deleted_orders} orders and "
+                f"{deleted_items} order items in {elapsed:.2f}s ({rate:.0f} customers/s)"
+            )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from crm.explain import SCAN_ALLOWED, filter_plans, uses_index
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN every filter in crm/filters.py against the current database and fail if one "
+        "outside crm.explain.SCAN_ALLOWED scans a table. Read-only; the test suite runs the "
+        "same check against the test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every query plan")
+
+    def handle(self, *args, **options):
+        scans = []
+        for label, plan in filter_plans():
+            indexed = uses_index(plan)
+            if indexed is None:
+                raise CommandError(f"Don't know how to read {connection.vendor} query plans")
+            if indexed:
+                self.stdout.write(self.style.SUCCESS(f"index  {label}"))
+            elif label in SCAN_ALLOWED:
+                self.stdout.write(f"scan   {label} (allowed)")
+            else:
+                scans.append(label)
+                self.stdout.write(self.style.WARNING(f"SCAN   {label}"))
+            if options['verbose_plans'] or label in scans:
+                self.stdout.write(f"    {plan}".replace('\n', '\n    '))
+
+        if scans:
+            raise CommandError(f"{len(scans)} filters scan a table: {', '.join(scans)}")
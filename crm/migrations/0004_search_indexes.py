@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:20
+
+import sqlite3
+
+from django.db import migrations
+
+# Frozen here rather than read from crm.search or the models, which may change
+SQLITE_FTS_TABLES = {
+    'crm_customer': ('name', 'email'),
+    'crm_product': ('name',),
+}
+
+POSTGRES_TRIGRAM_INDEXES = [
+    ('customer_name_trgm_idx', 'crm_customer', 'name'),
+    ('customer_email_trgm_idx', 'crm_customer', 'email'),
+    ('product_name_trgm_idx', 'crm_product', 'name'),
+]
+
+
+def install_sqlite_fts(schema_editor, table, fields):
+    """Create (or refresh) a table's FTS5 shadow table and the triggers that feed it"""
+    fts = f'{table}_fts'
+    columns = ', '.join(fields)
+    new_values = ', '.join(f'new.{field}' for field in fields)
+    old_values = ', '.join(f'old.{field}' for field in fields)
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{columns}, content='{table}', content_rowid='id', tokenize='trigram')"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END"
+    )
+    # Only writes to the searched columns touch the index; stock and price
+    # updates (reserve_stock, restocking) skip it
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END"
+    )
+    schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # The trigram tokenizer arrived in SQLite 3.34; older versions keep
+        # the icontains search of BasicSearchBackend
+        if sqlite3.sqlite_version_info >= (3, 34, 0):
+            for table, fields in SQLITE_FTS_TABLES.items():
+                install_sqlite_fts(schema_editor, table, fields)
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, table, column in POSTGRES_TRIGRAM_INDEXES:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)'
+            )
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for table in SQLITE_FTS_TABLES:
+            fts = f'{table}_fts'
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+    elif vendor == 'postgresql':
+        for name, _, _ in POSTGRES_TRIGRAM_INDEXES:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0003_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
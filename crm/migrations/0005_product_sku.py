@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:01
+
+from django.db import migrations, models
+
+
+def reinstall_product_fts(apps, schema_editor):
+    # Adding a unique column rebuilds crm_product on SQLite, dropping the
+    # triggers 0004 put on it. Names are frozen, as in 0004.
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if 'crm_product_fts' not in connection.introspection.table_names(cursor):
+            # SQLite too old for the trigram tokenizer; 0004 skipped FTS
+            return
+    schema_editor.execute(
+        "CREATE TRIGGER IF NOT EXISTS crm_product_fts_ai AFTER INSERT ON crm_product BEGIN "
+        "INSERT INTO crm_product_fts(rowid, name) VALUES (new.id, new.name); END"
+    )
+    schema_editor.execute(
+        "CREATE TRIGGER IF NOT EXISTS crm_product_fts_ad AFTER DELETE ON crm_product BEGIN "
+        "INSERT INTO crm_product_fts(crm_product_fts, rowid, name) VALUES ('delete', old.id, old.name); END"
+    )
+    schema_editor.execute(
+        "CREATE TRIGGER IF NOT EXISTS crm_product_fts_au AFTER UPDATE OF name ON crm_product BEGIN "
+        "INSERT INTO crm_product_fts(crm_product_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        "INSERT INTO crm_product_fts(rowid, name) VALUES (new.id, new.name); END"
+    )
+    schema_editor.execute("INSERT INTO crm_product_fts(crm_product_fts) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0004_search_indexes'),
+    ]
+
+    operations = [
+        # Unapplying removes the column, another rebuild, so reinstall after it
+        migrations.RunPython(migrations.RunPython.noop, reinstall_product_fts),
+        migrations.AddField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(reinstall_product_fts, migrations.RunPython.noop),
+    ]
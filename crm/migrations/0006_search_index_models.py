@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0005_product_sku'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSearchIndex',
+            fields=[
+                ('customer', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', related_query_name='search_index', serialize=False, to='crm.customer')),
+                ('document', models.TextField(db_column='crm_customer_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'crm_customer_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSearchIndex',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='+', related_query_name='search_index', serialize=False, to='crm.product')),
+                ('document', models.TextField(db_column='crm_product_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'crm_product_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,8 +1,9 @@
 from django.db import models
+from django.db.models import F, Lookup, Sum
 from django.core.validators import RegexValidator, EmailValidator
 from decimal import Decimal
 from django.core.exceptions import ValidationError
-import re
+from .validation import PHONE_MESSAGE, PHONE_PATTERN, validate_phone
 
 
 class Customer(models.Model):
@@ -13,33 +14,46 @@ class Customer(models.Model):
         blank=True, 
         null=True,
         validators=[
-            RegexValidator(
-                regex=r'^\+?1?\d{9,15}$|^\d{3}-\d{3}-\d{4}$',
-                message="Phone number must be in format: '+999999999' or '999-999-9999'"
-            )
+            RegexValidator(regex=PHONE_PATTERN, message=PHONE_MESSAGE)
         ]
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # created_at range filters and keyset pagination
+            models.Index(fields=['created_at', 'id'], name='customer_created_id_idx'),
+            # phone_starts_with / phone_pattern prefix lookups
+            models.Index(fields=['phone'], name='customer_phone_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.email})"
 
     def clean(self):
-        if self.phone:
-            # Clean phone number format
-            phone_clean = re.sub(r'[^\d+\-]', '', self.phone)
-            if not re.match(r'^\+?1?\d{9,15}$|^\d{3}-\d{3}-\d{4}$', phone_clean):
-                raise ValidationError({'phone': 'Invalid phone number format'})
+        if not validate_phone(self.phone):
+            raise ValidationError({'phone': 'Invalid phone number format'})
 
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
+    # Catalog key that bulk upserts match on
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_id_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['stock'], name='product_stock_idx'),
+            # Small partial index for the low_stock filter and restocking
+            models.Index(fields=['stock'], condition=models.Q(stock__lt=10), name='product_low_stock_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} - ${self.price}"
 
@@ -50,21 +64,89 @@ class Product(models.Model):
 
 class Order(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='orders')
-    products = models.ManyToManyField(Product, related_name='orders')
+    products = models.ManyToManyField(Product, through='OrderItem', related_name='orders')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     order_date = models.DateTimeField(auto_now_add=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # order_date range filters and keyset pagination
+            models.Index(fields=['order_date', 'id'], name='order_date_id_idx'),
+            # A customer's orders in date order (reminders, cleanup)
+            models.Index(fields=['customer', 'order_date'], name='order_customer_date_idx'),
+            models.Index(fields=['total_amount'], name='order_total_amount_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.customer.name}"
 
     def calculate_total(self):
         """Calculate total amount from associated products"""
-        return sum(product.price for product in self.products.all())
+        total = self.items.aggregate(total=Sum(F('quantity') * F('unit_price')))['total'] or Decimal('0')
+        return total.quantize(Decimal('0.01'))
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='order_items')
+    quantity = models.PositiveIntegerField(default=1)
+    # Price of the product when the order was placed
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        unique_together = [('order', 'product')]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name} (Order #{self.order_id})"
+
+
+class SearchDocument(models.TextField):
+    """The hidden column an FTS5 table shares its name with; only good for MATCH"""
+
+    def deconstruct(self):
+        # Migrations see a plain TextField; the MATCH lookup only matters to queries
+        name, _, args, kwargs = super().deconstruct()
+        return name, 'django.db.models.TextField', args, kwargs
+
+
+@SearchDocument.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+
+# The SQLite FTS5 tables migration 0004 keeps in step with customers and
+# products, mapped so searches join them (as search_index) instead of
+# running a MATCH per row. Read-only, and absent on other databases.
+class CustomerSearchIndex(models.Model):
+    customer = models.OneToOneField(
+        Customer, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        related_name='+', related_query_name='search_index',
+    )
+    document = SearchDocument(db_column='crm_customer_fts')
+    # bm25() of the current MATCH; lower is better
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'crm_customer_fts'
+
+
+class ProductSearchIndex(models.Model):
+    product = models.OneToOneField(
+        Product, on_delete=models.DO_NOTHING, primary_key=True, db_column='rowid',
+        related_name='+', related_query_name='search_index',
+    )
+    document = SearchDocument(db_column='crm_product_fts')
+    # bm25() of the current MATCH; lower is better
+    rank = models.FloatField()
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if self.products.exists():
-            self.total_amount = self.calculate_total()
-            super().save(update_fields=['total_amount'])
+    class Meta:
+        managed = False
+        db_table = 'crm_product_fts'
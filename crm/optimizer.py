@@ -0,0 +1,97 @@
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+# Connection arguments that only slice a relation; anything else is a filter
+PAGINATION_ARGS = {'first', 'last', 'before', 'after', 'offset'}
+
+
+def iter_fields(selection_set, fragments):
+    """Yield field nodes of a selection set, expanding fragments"""
+    if selection_set is None:
+        return
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            yield selection
+        elif isinstance(selection, InlineFragmentNode):
+            yield from iter_fields(selection.selection_set, fragments)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                yield from iter_fields(fragment.selection_set, fragments)
+
+
+def iter_node_fields(field_nodes, fragments):
+    """Yield the fields selected on the object itself, looking through relay edges/node"""
+    for field_node in field_nodes:
+        for child in iter_fields(field_node.selection_set, fragments):
+            if child.name.value != 'edges':
+                yield child
+                continue
+            for edge_child in iter_fields(child.selection_set, fragments):
+                if edge_child.name.value == 'node':
+                    yield from iter_fields(edge_child.selection_set, fragments)
+
+
+def has_filter_args(field_nodes):
+    return any(
+        argument.name.value not in PAGINATION_ARGS
+        for field_node in field_nodes
+        for argument in field_node.arguments
+    )
+
+
+def build_plan(model, field_nodes, fragments, prefix=''):
+    """Translate a selection into only(), select_related() and prefetch lookups"""
+    only = [prefix + model._meta.pk.name]
+    select_related = []
+    prefetches = []
+
+    selected = defaultdict(list)
+    for field_node in iter_node_fields(field_nodes, fragments):
+        selected[to_snake_case(field_node.name.value)].append(field_node)
+
+    for name, nodes in selected.items():
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+
+        if not field.is_relation:
+            only.append(prefix + name)
+        elif field.many_to_one or (field.one_to_one and field.concrete):
+            only.append(prefix + name)
+            select_related.append(prefix + name)
+            sub_only, sub_related, sub_prefetches = build_plan(
+                field.related_model, nodes, fragments, prefix=f'{prefix}{name}__'
+            )
+            only.extend(sub_only)
+            select_related.extend(sub_related)
+            prefetches.extend(sub_prefetches)
+        elif (field.one_to_many or field.many_to_many) and not has_filter_args(nodes):
+            # Filtered relations are resolved per parent by the connection field
+            required = [field.field.name] if field.one_to_many else []
+            queryset = optimize(
+                field.related_model._default_manager.all(), nodes, fragments, required
+            )
+            prefetches.append(Prefetch(prefix + name, queryset=queryset))
+
+    return only, select_related, prefetches
+
+
+def optimize(queryset, field_nodes, fragments, required=()):
+    only, select_related, prefetches = build_plan(queryset.model, field_nodes, fragments)
+    queryset = queryset.only(*only, *required)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+def optimize_queryset(queryset, info, required=()):
+    """Fetch only the columns and relations the current field's selection asks for"""
+    return optimize(queryset, info.field_nodes, info.fragments, required)
@@ -0,0 +1,137 @@
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from graphql_relay import to_global_id
+
+from .models import Customer, Order
+
+
+def after(order_date, pk):
+    """Q for orders strictly after (order_date, pk) in (order_date, id) order"""
+    return Q(order_date__gt=order_date) | Q(order_date=order_date, pk__gt=pk)
+
+
+def iter_order_chunks(since, last=None, chunk_size=1000):
+    """Yield lists of (order_date, pk, customer_id) for orders placed since `since`
+
+    Walks the (order_date, id) index one chunk at a time, starting after
+    `last` when given, so memory stays flat however many orders there are.
+    """
+    orders = Order.objects.filter(order_date__gte=since).order_by('order_date', 'pk')
+    while True:
+        queryset = orders.filter(after(*last)) if last else orders
+        chunk = list(queryset.values_list('order_date', 'pk', 'customer_id')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1][:2]
+
+
+def already_reminded(customer_ids, since, first):
+    """Customers among customer_ids with an order in the window before `first`
+
+    Each customer is reminded at their first order in the window, so this
+    is exactly the set an earlier chunk (or an earlier, crashed run)
+    has already covered.
+    """
+    first_date, first_pk = first
+    earlier = Q(order_date__lt=first_date) | Q(order_date=first_date, pk__lt=first_pk)
+    return set(
+        Order.objects.filter(earlier, customer_id__in=customer_ids, order_date__gte=since)
+        .values_list('customer_id', flat=True)
+        .distinct()
+    )
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if 'run' not in checkpoint:
+        # Written before checkpoints recorded their run; can't tell whose it is
+        return None
+    return {
+        'run': parse_date(checkpoint['run']),
+        'since': parse_datetime(checkpoint['since']),
+        'last': (parse_datetime(checkpoint['last'][0]), checkpoint['last'][1]) if checkpoint['last'] else None,
+        'sent': checkpoint['sent'],
+    }
+
+
+def write_checkpoint(path, run, since, last, sent):
+    """Replace the checkpoint atomically, so a crash never leaves half of one"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'run': run.isoformat(),
+            'since': since.isoformat(),
+            'last': [last[0].isoformat(), last[1]] if last else None,
+            'sent': sent,
+        }, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def send_order_reminders(log_file, checkpoint_file, days=7, chunk_size=None, now=None):
+    """Log one reminder per customer who ordered in the last `days` days
+
+    Orders are read in keyset chunks. Each chunk's reminders are written
+    in one buffered write, then the last order of the chunk is
+    checkpointed. A rerun after a crash on the same day resumes from the
+    checkpoint with the original window; at most the one chunk in flight
+    is written twice. A checkpoint left by an earlier day's run is
+    discarded, since that day's window is long gone. Returns the number
+    of reminders sent by the whole (possibly resumed) run.
+    """
+    chunk_size = chunk_size or getattr(settings, 'CRM_REMINDER_CHUNK_SIZE', 1000)
+    now = now or timezone.now()
+    # Runs are daily; the run a checkpoint belongs to is the day it started
+    run = timezone.localdate(now)
+
+    checkpoint = read_checkpoint(checkpoint_file)
+    if checkpoint and checkpoint['run'] == run:
+        since, last, sent = checkpoint['since'], checkpoint['last'], checkpoint['sent']
+    else:
+        since, last, sent = now - timedelta(days=days), None, 0
+
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    with open(log_file, 'a') as f:
+        for chunk in iter_order_chunks(since, last, chunk_size):
+            customer_ids = {customer_id for _, _, customer_id in chunk}
+            skip = already_reminded(customer_ids, since, chunk[0][:2])
+            # One query for every email this chunk needs
+            emails = dict(
+                Customer.objects.filter(pk__in=customer_ids - skip).values_list('pk', 'email')
+            )
+
+            lines = []
+            for _, pk, customer_id in chunk:
+                if customer_id in skip:
+                    continue
+                skip.add(customer_id)
+                order_id = to_global_id('OrderType', pk)
+                lines.append(
+                    f"{timestamp} - Order ID: {order_id}, Customer Email: {emails.get(customer_id, 'N/A')}\n"
+                )
+            f.writelines(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+            sent += len(lines)
+            last = chunk[-1][:2]
+            write_checkpoint(checkpoint_file, run, since, last, sent)
+
+    # A finished run starts the next one from a fresh window
+    try:
+        os.remove(checkpoint_file)
+    except FileNotFoundError:
+        pass
+    return sent
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from graphene.relay import Connection
+from graphene.utils.str_converters import to_snake_case
+from graphql import TypeInfo, TypeInfoVisitor, Visitor, get_named_type, print_ast, visit
+
+from .optimizer import PAGINATION_ARGS
+
+# Fields that are not backed by a model type, and the models they read
+AGGREGATE_FIELDS = {
+    'Query.crmStats': ('crm.Customer', 'crm.Order'),
+}
+
+
+def get_cache():
+    """The Django cache holding query results, or None when result caching is off
+
+    crm.checks warns at startup when this is a per-process cache.
+    """
+    alias = getattr(settings, 'CRM_RESPONSE_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def version_key(model):
+    return f'crm:rc:version:{model._meta.label_lower}'
+
+
+def get_versions(cache, models):
+    """Current generation of each model; a result is only valid for the generations it saw"""
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start unseen (or evicted) counters at the clock rather than 0,
+            # so they can never come back to a generation cached earlier
+            cache.add(key, time.time_ns())
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(models):
+    cache = get_cache()
+    if cache is None:
+        return
+    for model in models:
+        key = version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate(*models):
+    """Drop cached results that read any of the given models once the transaction commits
+
+    Signals cover save(), delete() and m2m changes; writes that bypass them
+    (bulk_create, update(), raw SQL) must call this themselves.
+    """
+    transaction.on_commit(lambda: bump_versions(models))
+
+
+def graphql_model(graphql_type):
+    """The Django model behind a GraphQL object or connection type, if any"""
+    graphene_type = getattr(get_named_type(graphql_type), 'graphene_type', None)
+    meta = getattr(graphene_type, '_meta', None)
+    if isinstance(graphene_type, type) and issubclass(graphene_type, Connection):
+        meta = getattr(meta.node, '_meta', None)
+    return getattr(meta, 'model', None)
+
+
+def related_models(model):
+    """Models reachable through a model's own foreign keys and many-to-many tables"""
+    models = set()
+    for field in model._meta.get_fields():
+        if field.many_to_many and field.concrete:
+            models.update((field.related_model, field.remote_field.through))
+        elif field.is_relation and field.concrete:
+            models.add(field.related_model)
+    return models
+
+
+class ResponsePlan:
+    """What a query document reads and how long its results may be cached"""
+
+    def __init__(self, schema, document):
+        self.normalized = print_ast(document)
+        self.models = set()
+        self.ttl = getattr(settings, 'CRM_RESPONSE_CACHE_TTL', 60)
+        self.field_ttls = getattr(settings, 'CRM_RESPONSE_CACHE_FIELD_TTLS', {})
+
+        type_info = TypeInfo(schema.graphql_schema)
+        visit(document, TypeInfoVisitor(type_info, PlanVisitor(self, type_info)))
+        # Sorted so the version lookup, and with it the cache key, is stable
+        self.models = sorted(self.models, key=lambda model: model._meta.label_lower)
+
+    def add_field(self, parent_type, field_def, node):
+        hint = self.field_ttls.get(f'{parent_type.name}.{node.name.value}')
+        if hint is not None:
+            self.ttl = min(self.ttl, hint)
+
+        for label in AGGREGATE_FIELDS.get(f'{parent_type.name}.{node.name.value}', ()):
+            self.models.add(apps.get_model(label))
+
+        model = graphql_model(field_def.type)
+        if model is not None:
+            self.models.add(model)
+            if any(argument.name.value not in PAGINATION_ARGS for argument in node.arguments):
+                # Filters can reach across relations (customer name, product id...)
+                self.models.update(related_models(model))
+
+        parent_model = graphql_model(parent_type)
+        if parent_model is not None:
+            try:
+                field = parent_model._meta.get_field(to_snake_case(node.name.value))
+            except FieldDoesNotExist:
+                return
+            if field.many_to_many:
+                # Membership lives in the through table, not on either end
+                through = field.remote_field.through if field.concrete else field.through
+                self.models.add(through)
+
+    def cache_key(self, cache, variables, operation_name):
+        payload = json.dumps(
+            [self.normalized, operation_name, variables or {}, get_versions(cache, self.models)],
+            sort_keys=True,
+            cls=DjangoJSONEncoder,
+        )
+        return 'crm:rc:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class PlanVisitor(Visitor):
+    def __init__(self, plan, type_info):
+        super().__init__()
+        self.plan = plan
+        self.type_info = type_info
+
+    def enter_field(self, node, *args):
+        parent_type = self.type_info.get_parent_type()
+        field_def = self.type_info.get_field_def()
+        if parent_type is not None and field_def is not None:
+            self.plan.add_field(parent_type, field_def, node)
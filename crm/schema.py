@@ -1,38 +1,81 @@
 import graphene
 from graphene_django import DjangoObjectType
-from graphene_django.filter import DjangoFilterConnectionField
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import transaction
+from django.core.validators import DecimalValidator
+from django.db import DatabaseError, transaction
 from decimal import Decimal, InvalidOperation
-from .models import Customer, Product, Order
+from .models import Customer, Product, Order, OrderItem
 from .filters import CustomerFilter, ProductFilter, OrderFilter
-import re
+from .fields import BatchedFilterConnectionField, KeysetConnectionField
+from .filtering import InputFilter
+from .loaders import get_loaders
+from .optimizer import optimize_queryset
+from .response_cache import invalidate
+from .stats import crm_stats
+from .stock import InsufficientStock, reserve_stock, restock_low_stock
+from .streaming import resolve_list
+from .validation import customer_errors
 
 
 # GraphQL Types
 class CustomerType(DjangoObjectType):
+    orders = BatchedFilterConnectionField(lambda: OrderType, required=True)
+
     class Meta:
         model = Customer
         fields = "__all__"
         filter_fields = ['name', 'email', 'phone']
         interfaces = (graphene.relay.Node,)
 
+    def resolve_orders(self, info, **kwargs):
+        return get_loaders(info).load(self, 'orders')
+
 
 class ProductType(DjangoObjectType):
+    orders = BatchedFilterConnectionField(lambda: OrderType, required=True)
+
     class Meta:
         model = Product
         fields = "__all__"
         filter_fields = ['name', 'price', 'stock']
         interfaces = (graphene.relay.Node,)
 
+    def resolve_orders(self, info, **kwargs):
+        return get_loaders(info).load(self, 'orders')
+
+    def resolve_order_items(self, info):
+        return get_loaders(info).load(self, 'order_items')
+
+
+class OrderItemType(DjangoObjectType):
+    class Meta:
+        model = OrderItem
+        fields = ('id', 'product', 'quantity', 'unit_price')
+
+    def resolve_product(self, info):
+        return get_loaders(info).load(self, 'product')
+
 
 class OrderType(DjangoObjectType):
+    products = BatchedFilterConnectionField(ProductType, required=True)
+    items = graphene.List(graphene.NonNull(OrderItemType), required=True)
+
     class Meta:
         model = Order
         fields = "__all__"
         filter_fields = ['total_amount', 'order_date']
         interfaces = (graphene.relay.Node,)
 
+    def resolve_customer(self, info):
+        return get_loaders(info).load(self, 'customer')
+
+    def resolve_products(self, info, **kwargs):
+        return get_loaders(info).load(self, 'products')
+
+    def resolve_items(self, info):
+        return get_loaders(info).load(self, 'items')
+
 
 # Custom Error Types
 class ErrorType(graphene.ObjectType):
@@ -46,6 +89,18 @@ class CustomerErrorType(graphene.ObjectType):
     errors = graphene.List(ErrorType)
 
 
+class ProductErrorType(graphene.ObjectType):
+    index = graphene.Int()
+    name = graphene.String()
+    errors = graphene.List(ErrorType)
+
+
+class OrderErrorType(graphene.ObjectType):
+    index = graphene.Int()
+    customer_id = graphene.Int()
+    errors = graphene.List(ErrorType)
+
+
 # Mutation Response Types
 class CreateCustomerResponse(graphene.ObjectType):
     customer = graphene.Field(CustomerType)
@@ -75,6 +130,42 @@ class CreateOrderResponse(graphene.ObjectType):
     errors = graphene.List(ErrorType)
 
 
+class BulkUpsertProductsResponse(graphene.ObjectType):
+    created_count = graphene.Int()
+    updated_count = graphene.Int()
+    unchanged_count = graphene.Int()
+    errors = graphene.List(ProductErrorType)
+    message = graphene.String()
+
+
+class BulkCreateOrdersResponse(graphene.ObjectType):
+    orders = graphene.List(OrderType)
+    success_count = graphene.Int()
+    errors = graphene.List(OrderErrorType)
+    message = graphene.String()
+
+
+# Reporting Types
+class StatsGroupBy(graphene.Enum):
+    DAY = 'day'
+    WEEK = 'week'
+
+
+class CrmStatsBucketType(graphene.ObjectType):
+    period = graphene.DateTime(required=True)
+    order_count = graphene.Int(required=True)
+    total_revenue = graphene.Decimal(required=True)
+    average_order_value = graphene.Decimal(required=True)
+
+
+class CrmStatsType(graphene.ObjectType):
+    customer_count = graphene.Int(required=True)
+    order_count = graphene.Int(required=True)
+    total_revenue = graphene.Decimal(required=True)
+    average_order_value = graphene.Decimal(required=True)
+    buckets = graphene.List(graphene.NonNull(CrmStatsBucketType), required=True)
+
+
 # Input Types
 class CustomerInput(graphene.InputObjectType):
     name = graphene.String(required=True)
@@ -82,6 +173,25 @@ class CustomerInput(graphene.InputObjectType):
     phone = graphene.String()
 
 
+class ProductUpsertInput(graphene.InputObjectType):
+    sku = graphene.String(required=True)
+    name = graphene.String(required=True)
+    price = graphene.Decimal(required=True)
+    # Left out (or null): new products start at 0, existing ones keep their stock
+    stock = graphene.Int()
+
+
+class OrderItemInput(graphene.InputObjectType):
+    product_id = graphene.Int(required=True)
+    quantity = graphene.Int()
+
+
+class OrderInput(graphene.InputObjectType):
+    customer_id = graphene.Int(required=True)
+    product_ids = graphene.List(graphene.Int)
+    items = graphene.List(OrderItemInput)
+
+
 # Filter Input Types
 class CustomerFilterInput(graphene.InputObjectType):
     name_icontains = graphene.String()
@@ -90,6 +200,7 @@ class CustomerFilterInput(graphene.InputObjectType):
     created_at_lte = graphene.DateTime()
     phone_pattern = graphene.String()
     phone_starts_with = graphene.String()
+    search = graphene.String()
 
 
 class ProductFilterInput(graphene.InputObjectType):
@@ -100,6 +211,7 @@ class ProductFilterInput(graphene.InputObjectType):
     stock_lte = graphene.Int()
     stock = graphene.Int()
     low_stock = graphene.Boolean()
+    search = graphene.String()
 
 
 class OrderFilterInput(graphene.InputObjectType):
@@ -111,21 +223,437 @@ class OrderFilterInput(graphene.InputObjectType):
     product_name = graphene.String()
     product_id = graphene.Int()
     customer_email = graphene.String()
+    search = graphene.String()
+
+
+# Filter inputs compiled onto the FilterSets the connection fields use
+CUSTOMER_FILTER = InputFilter(CustomerFilterInput, CustomerFilter, aliases={
+    'name_icontains': 'name',
+    'email_icontains': 'email',
+})
+PRODUCT_FILTER = InputFilter(ProductFilterInput, ProductFilter, aliases={
+    'name_icontains': 'name',
+})
+ORDER_FILTER = InputFilter(OrderFilterInput, OrderFilter)
 
 
 # Utility Functions
-def validate_phone(phone):
-    """Validate phone number format"""
-    if not phone:
-        return True
-    
-    phone_clean = re.sub(r'[^\d+\-]', '', phone)
-    return bool(re.match(r'^\+?1?\d{9,15}$|^\d{3}-\d{3}-\d{4}$', phone_clean))
+def validate_product(price, stock):
+    """Validate product price and stock, returning the parsed values and errors"""
+    errors = []
+    price_decimal = None
+
+    # Validate price
+    try:
+        price_decimal = Decimal(str(price))
+    except (InvalidOperation, ValueError):
+        errors.append(ErrorType(field="price", message="Invalid price format"))
+    else:
+        if not price_decimal.is_finite():
+            errors.append(ErrorType(field="price", message="Invalid price format"))
+            price_decimal = None
+        elif price_decimal <= 0:
+            errors.append(ErrorType(field="price", message="Price must be positive"))
+        else:
+            # SQLite stores whatever it is given, and reading an oversized
+            # value back fails, so the column's precision is checked here
+            price_field = Product._meta.get_field('price')
+            try:
+                DecimalValidator(price_field.max_digits, price_field.decimal_places)(price_decimal)
+            except ValidationError as e:
+                errors.extend(ErrorType(field="price", message=message) for message in e.messages)
+
+    # Validate stock
+    try:
+        stock = int(stock or 0)
+        if stock < 0:
+            errors.append(ErrorType(field="stock", message="Stock cannot be negative"))
+    except (TypeError, ValueError):
+        errors.append(ErrorType(field="stock", message="Invalid stock format"))
+
+    return price_decimal, stock, errors
+
+
+def get_bulk_chunk_size(chunk_size=None):
+    """Return the batch size used for bulk inserts"""
+    return chunk_size or getattr(settings, 'CRM_BULK_CHUNK_SIZE', 1000)
+
 
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
-def validate_email(email):
-    """Validate email format"""
-    return bool(re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email))
+
+def bulk_create_customers(rows, chunk_size=None):
+    """Validate customer rows in memory and insert the valid ones in chunks
+
+    Returns the created customers and a list of CustomerErrorType, one per
+    rejected row, keyed by the row's index in the input.
+    """
+    chunk_size = get_bulk_chunk_size(chunk_size)
+    rows = list(rows)
+    emails = [(row.get('email') or '').lower().strip() for row in rows]
+
+    # Look up every email that already exists in one query per chunk
+    existing_emails = set()
+    for email_chunk in chunked(list(set(emails)), chunk_size):
+        existing_emails.update(
+            Customer.objects.filter(email__in=email_chunk).values_list('email', flat=True)
+        )
+
+    # Validate email and phone formats a column at a time
+    format_errors = customer_errors(
+        [row.get('email') for row in rows], [row.get('phone') for row in rows]
+    )
+
+    errors = []
+    candidates = []
+    seen_emails = set()
+    for index, (row, email, row_errors) in enumerate(zip(rows, emails, format_errors)):
+        row_errors = [ErrorType(field=field, message=message) for field, message in row_errors]
+        name = (row.get('name') or '').strip()
+        phone = row.get('phone')
+        if not name:
+            row_errors.insert(0, ErrorType(field="name", message="Name is required"))
+        # A phone can pass the format check with noise around the number
+        for field, value in (('name', name), ('email', email), ('phone', phone.strip() if phone else '')):
+            max_length = Customer._meta.get_field(field).max_length
+            if len(value) > max_length:
+                row_errors.append(ErrorType(
+                    field=field, message=f"Must be at most {max_length} characters"
+                ))
+
+        # Check email uniqueness against the database and the batch itself
+        if email in existing_emails:
+            row_errors.append(ErrorType(field="email", message="Email already exists"))
+        elif email in seen_emails:
+            row_errors.append(ErrorType(field="email", message="Duplicate email in batch"))
+
+        if row_errors:
+            errors.append(CustomerErrorType(
+                index=index,
+                email=row.get('email'),
+                errors=row_errors
+            ))
+            continue
+
+        seen_emails.add(email)
+        candidates.append((index, row.get('email'), Customer(
+            name=name,
+            email=email,
+            phone=phone.strip() if phone else None
+        )))
+
+    created_customers = []
+    for chunk in chunked(candidates, chunk_size):
+        try:
+            with transaction.atomic():
+                created_customers.extend(
+                    Customer.objects.bulk_create([customer for _, _, customer in chunk])
+                )
+            continue
+        except DatabaseError:
+            pass
+
+        # A concurrent writer claimed one of the emails, or the database
+        # rejected a row the checks above let through: retry the chunk row
+        # by row so only the failing rows are reported.
+        for index, raw_email, customer in chunk:
+            customer.pk = None
+            try:
+                with transaction.atomic():
+                    customer.save()
+                created_customers.append(customer)
+            except DatabaseError as e:
+                errors.append(CustomerErrorType(
+                    index=index,
+                    email=raw_email,
+                    errors=[ErrorType(field="general", message=str(e))]
+                ))
+
+    if created_customers:
+        invalidate(Customer)
+    errors.sort(key=lambda error: error.index)
+    return created_customers, errors
+
+
+def bulk_create_products(rows, chunk_size=None):
+    """Validate product rows in memory and insert the valid ones in chunks
+
+    Returns the created products and a list of ProductErrorType, one per
+    rejected row, keyed by the row's index in the input.
+    """
+    chunk_size = get_bulk_chunk_size(chunk_size)
+    errors = []
+    candidates = []
+    for index, row in enumerate(rows):
+        price, stock, product_errors = validate_product(row.get('price'), row.get('stock'))
+        name = (row.get('name') or '').strip()
+        if not name:
+            product_errors.append(ErrorType(field="name", message="Name is required"))
+
+        if product_errors:
+            errors.append(ProductErrorType(index=index, name=row.get('name'), errors=product_errors))
+            continue
+
+        candidates.append((index, row.get('name'), Product(name=name, price=price, stock=stock)))
+
+    created_products = []
+    for chunk in chunked(candidates, chunk_size):
+        try:
+            with transaction.atomic():
+                created_products.extend(
+                    Product.objects.bulk_create([product for _, _, product in chunk])
+                )
+            continue
+        except DatabaseError:
+            pass
+
+        # The database rejected a row the checks above let through: retry the
+        # chunk row by row so only the failing rows are reported.
+        for index, raw_name, product in chunk:
+            product.pk = None
+            try:
+                with transaction.atomic():
+                    product.save()
+                created_products.append(product)
+            except DatabaseError as e:
+                errors.append(ProductErrorType(
+                    index=index,
+                    name=raw_name,
+                    errors=[ErrorType(field="general", message=str(e))]
+                ))
+
+    if created_products:
+        invalidate(Product)
+    errors.sort(key=lambda error: error.index)
+    return created_products, errors
+
+
+def bulk_upsert_products(rows, chunk_size=None):
+    """Insert or update products by SKU, one INSERT ... ON CONFLICT per chunk
+
+    The chunk's existing rows are read first (one sku__in query) so rows
+    can be counted as created, updated or unchanged; unchanged rows are
+    not written at all. A row without stock leaves an existing product's
+    stock alone, so a catalogue sync can't wipe inventory. When the
+    database rejects a statement, its rows are retried one by one so only
+    the failing rows are reported. Returns those three counts and a list
+    of ProductErrorType for rejected rows, keyed by input index. A row
+    written concurrently between the read and the upsert may be
+    miscounted, but never duplicated.
+    """
+    chunk_size = get_bulk_chunk_size(chunk_size)
+    errors = []
+    candidates = []
+    seen_skus = set()
+    for index, row in enumerate(rows):
+        price, stock, product_errors = validate_product(row.get('price'), row.get('stock'))
+        name = (row.get('name') or '').strip()
+        sku = (row.get('sku') or '').strip()
+        if not name:
+            product_errors.append(ErrorType(field="name", message="Name is required"))
+        if not sku:
+            product_errors.append(ErrorType(field="sku", message="SKU is required"))
+        elif sku in seen_skus:
+            product_errors.append(ErrorType(field="sku", message="Duplicate SKU in batch"))
+
+        if product_errors:
+            errors.append(ProductErrorType(index=index, name=row.get('name'), errors=product_errors))
+            continue
+
+        seen_skus.add(sku)
+        product = Product(sku=sku, name=name, price=price.quantize(Decimal('0.01')), stock=stock)
+        candidates.append((index, row.get('name'), product, row.get('stock') is not None))
+
+    created = updated = unchanged = 0
+    for chunk in chunked(candidates, chunk_size):
+        existing = {
+            sku: values for sku, *values in Product.objects.filter(
+                sku__in=[product.sku for _, _, product, _ in chunk]
+            ).values_list('sku', 'name', 'price', 'stock')
+        }
+        # Rows with and without stock update different columns, so they
+        # go out as separate statements
+        changed = {True: [], False: []}
+        for index, raw_name, product, has_stock in chunk:
+            values = existing.get(product.sku)
+            supplied = [product.name, product.price, *([product.stock] if has_stock else [])]
+            if values is not None and values[:len(supplied)] == supplied:
+                unchanged += 1
+                continue
+            changed[has_stock].append((index, raw_name, product, values is None))
+
+        for has_stock, entries in changed.items():
+            if not entries:
+                continue
+            upsert_options = {
+                'update_conflicts': True,
+                'unique_fields': ['sku'],
+                'update_fields': ['name', 'price', *(['stock'] if has_stock else []), 'updated_at'],
+            }
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_create([product for _, _, product, _ in entries], **upsert_options)
+                written = entries
+            except DatabaseError:
+                # The database rejected a row the checks above let through:
+                # retry the statement row by row so only the failing rows
+                # are reported.
+                written = []
+                for entry in entries:
+                    index, raw_name, product, _ = entry
+                    try:
+                        with transaction.atomic():
+                            Product.objects.bulk_create([product], **upsert_options)
+                        written.append(entry)
+                    except DatabaseError as e:
+                        errors.append(ProductErrorType(
+                            index=index,
+                            name=raw_name,
+                            errors=[ErrorType(field="general", message=str(e))]
+                        ))
+
+            new = sum(1 for *_, is_new in written if is_new)
+            created += new
+            updated += len(written) - new
+
+    if created or updated:
+        invalidate(Product)
+    errors.sort(key=lambda error: error.index)
+    return created, updated, unchanged, errors
+
+
+def order_quantities(product_ids=None, items=None):
+    """Merge product_ids and items into one quantity per product; repeated IDs add up
+
+    Returns the quantities and a list of ErrorType for missing product IDs
+    and invalid quantities.
+    """
+    errors = []
+    quantities = {}
+    for product_id in product_ids or []:
+        if product_id is None:
+            errors.append(ErrorType(field="product_ids", message="Product IDs cannot be null"))
+            continue
+        quantities[product_id] = quantities.get(product_id, 0) + 1
+    for item in items or []:
+        product_id = item.get('product_id') if item else None
+        if product_id is None:
+            errors.append(ErrorType(field="items", message="Every item needs a product ID"))
+            continue
+        quantity = 1 if item.get('quantity') is None else item.get('quantity')
+        if quantity < 1:
+            errors.append(ErrorType(
+                field="items",
+                message=f"Quantity for product {product_id} must be at least 1"
+            ))
+            continue
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities, errors
+
+
+def shortage_errors(shortages):
+    """One ErrorType per product InsufficientStock reports short"""
+    return [
+        ErrorType(
+            field="items",
+            message=f"Insufficient stock for product {product_id}: "
+                    f"requested {requested}, available {available}"
+        )
+        for product_id, requested, available in shortages
+    ]
+
+
+def insert_orders(candidates, prices):
+    """Reserve stock for and insert (index, order, quantities) candidates at once
+
+    Must run inside a transaction; raises InsufficientStock if the
+    candidates together need more than is in stock.
+    """
+    requested = {}
+    for _, _, quantities in candidates:
+        for product_id, quantity in quantities.items():
+            requested[product_id] = requested.get(product_id, 0) + quantity
+    reserve_stock(requested)
+
+    orders = Order.objects.bulk_create([order for _, order, _ in candidates])
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product_id=product_id, quantity=quantity, unit_price=prices[product_id])
+        for order, (_, _, quantities) in zip(orders, candidates)
+        for product_id, quantity in quantities.items()
+    ])
+    return orders
+
+
+def bulk_create_orders(rows, chunk_size=None):
+    """Validate order rows against the database in bulk and insert the valid ones in chunks
+
+    Every customer and product ID is checked with one id__in query per
+    chunk, and totals are computed from the product prices those return.
+    Stock is reserved per chunk; a chunk that runs short is retried row by
+    row so only the rows that can't be filled are reported. Returns the
+    created orders and a list of OrderErrorType keyed by input index.
+    """
+    chunk_size = get_bulk_chunk_size(chunk_size)
+    rows = list(rows)
+    parsed = [order_quantities(row.get('product_ids'), row.get('items')) for row in rows]
+
+    customer_ids = set()
+    for chunk in chunked(list({row.get('customer_id') for row in rows}), chunk_size):
+        customer_ids.update(Customer.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+    prices = {}
+    for chunk in chunked(list({pid for quantities, _ in parsed for pid in quantities}), chunk_size):
+        prices.update(Product.objects.filter(pk__in=chunk).values_list('pk', 'price'))
+
+    errors = []
+    candidates = []
+    for index, (row, (quantities, order_errors)) in enumerate(zip(rows, parsed)):
+        customer_id = row.get('customer_id')
+        if customer_id not in customer_ids:
+            order_errors.append(ErrorType(field="customer_id", message="Customer not found"))
+        if not quantities:
+            order_errors.append(ErrorType(field="product_ids", message="At least one product must be selected"))
+        invalid_ids = set(quantities) - set(prices)
+        if invalid_ids:
+            order_errors.append(ErrorType(
+                field="product_ids",
+                message=f"Invalid product IDs: {sorted(invalid_ids)}"
+            ))
+
+        if order_errors:
+            errors.append(OrderErrorType(index=index, customer_id=customer_id, errors=order_errors))
+            continue
+
+        total = sum((prices[product_id] * quantity for product_id, quantity in quantities.items()), Decimal('0'))
+        candidates.append((index, Order(customer_id=customer_id, total_amount=total), quantities))
+
+    created_orders = []
+    for chunk in chunked(candidates, chunk_size):
+        try:
+            with transaction.atomic():
+                created_orders.extend(insert_orders(chunk, prices))
+            continue
+        except InsufficientStock:
+            pass
+
+        # Some product ran out across the chunk: retry row by row so only
+        # the orders that can't be filled are reported.
+        for index, order, quantities in chunk:
+            try:
+                with transaction.atomic():
+                    created_orders.extend(insert_orders([(index, order, quantities)], prices))
+            except InsufficientStock as e:
+                errors.append(OrderErrorType(
+                    index=index,
+                    customer_id=order.customer_id,
+                    errors=shortage_errors(e.shortages)
+                ))
+
+    if created_orders:
+        invalidate(Order, OrderItem)
+    errors.sort(key=lambda error: error.index)
+    return created_orders, errors
 
 
 # Mutations
@@ -138,15 +666,11 @@ class CreateCustomer(graphene.Mutation):
     Output = CreateCustomerResponse
 
     def mutate(self, info, name, email, phone=None):
-        errors = []
-
-        # Validate email format
-        if not validate_email(email):
-            errors.append(ErrorType(field="email", message="Invalid email format"))
-
-        # Validate phone format
-        if phone and not validate_phone(phone):
-            errors.append(ErrorType(field="phone", message="Invalid phone number format"))
+        # Validate email and phone formats
+        errors = [
+            ErrorType(field=field, message=message)
+            for field, message in customer_errors([email], [phone])[0]
+        ]
 
         # Check email uniqueness
         if Customer.objects.filter(email=email).exists():
@@ -184,50 +708,12 @@ class CreateCustomer(graphene.Mutation):
 class BulkCreateCustomers(graphene.Mutation):
     class Arguments:
         customers = graphene.List(CustomerInput, required=True)
+        chunk_size = graphene.Int()
 
     Output = BulkCreateCustomersResponse
 
-    def mutate(self, info, customers):
-        created_customers = []
-        errors = []
-        
-        with transaction.atomic():
-            for index, customer_data in enumerate(customers):
-                customer_errors = []
-                
-                # Validate email format
-                if not validate_email(customer_data.email):
-                    customer_errors.append(ErrorType(field="email", message="Invalid email format"))
-
-                # Validate phone format
-                if customer_data.phone and not validate_phone(customer_data.phone):
-                    customer_errors.append(ErrorType(field="phone", message="Invalid phone number format"))
-
-                # Check email uniqueness
-                if Customer.objects.filter(email=customer_data.email).exists():
-                    customer_errors.append(ErrorType(field="email", message="Email already exists"))
-
-                if customer_errors:
-                    errors.append(CustomerErrorType(
-                        index=index,
-                        email=customer_data.email,
-                        errors=customer_errors
-                    ))
-                    continue
-
-                try:
-                    customer = Customer.objects.create(
-                        name=customer_data.name.strip(),
-                        email=customer_data.email.lower().strip(),
-                        phone=customer_data.phone.strip() if customer_data.phone else None
-                    )
-                    created_customers.append(customer)
-                except Exception as e:
-                    errors.append(CustomerErrorType(
-                        index=index,
-                        email=customer_data.email,
-                        errors=[ErrorType(field="general", message=str(e))]
-                    ))
+    def mutate(self, info, customers, chunk_size=None):
+        created_customers, errors = bulk_create_customers(customers, chunk_size)
 
         return BulkCreateCustomersResponse(
             customers=created_customers,
@@ -246,19 +732,7 @@ class CreateProduct(graphene.Mutation):
     Output = CreateProductResponse
 
     def mutate(self, info, name, price, stock=0):
-        errors = []
-
-        # Validate price
-        try:
-            price_decimal = Decimal(str(price))
-            if price_decimal <= 0:
-                errors.append(ErrorType(field="price", message="Price must be positive"))
-        except (InvalidOperation, ValueError):
-            errors.append(ErrorType(field="price", message="Invalid price format"))
-
-        # Validate stock
-        if stock < 0:
-            errors.append(ErrorType(field="stock", message="Stock cannot be negative"))
+        price_decimal, stock, errors = validate_product(price, stock)
 
         if errors:
             return CreateProductResponse(
@@ -289,14 +763,34 @@ class CreateProduct(graphene.Mutation):
             )
 
 
+class BulkUpsertProducts(graphene.Mutation):
+    class Arguments:
+        products = graphene.List(ProductUpsertInput, required=True)
+        chunk_size = graphene.Int()
+
+    Output = BulkUpsertProductsResponse
+
+    def mutate(self, info, products, chunk_size=None):
+        created, updated, unchanged, errors = bulk_upsert_products(products, chunk_size)
+
+        return BulkUpsertProductsResponse(
+            created_count=created,
+            updated_count=updated,
+            unchanged_count=unchanged,
+            errors=errors,
+            message=f"Created {created}, updated {updated} and left {unchanged} products unchanged"
+        )
+
+
 class CreateOrder(graphene.Mutation):
     class Arguments:
         customer_id = graphene.Int(required=True)
-        product_ids = graphene.List(graphene.Int, required=True)
+        product_ids = graphene.List(graphene.Int)
+        items = graphene.List(OrderItemInput)
 
     Output = CreateOrderResponse
 
-    def mutate(self, info, customer_id, product_ids):
+    def mutate(self, info, customer_id, product_ids=None, items=None):
         errors = []
 
         # Validate customer exists
@@ -306,16 +800,20 @@ class CreateOrder(graphene.Mutation):
             errors.append(ErrorType(field="customer_id", message="Customer not found"))
             customer = None
 
+        quantities, quantity_errors = order_quantities(product_ids, items)
+        errors.extend(quantity_errors)
+
         # Validate products exist
-        if not product_ids:
+        if not quantities:
             errors.append(ErrorType(field="product_ids", message="At least one product must be selected"))
+            products = {}
         else:
-            existing_products = Product.objects.filter(id__in=product_ids)
-            if len(existing_products) != len(product_ids):
-                invalid_ids = set(product_ids) - set(existing_products.values_list('id', flat=True))
+            products = Product.objects.in_bulk(list(quantities))
+            invalid_ids = set(quantities) - set(products)
+            if invalid_ids:
                 errors.append(ErrorType(
-                    field="product_ids", 
-                    message=f"Invalid product IDs: {list(invalid_ids)}"
+                    field="product_ids",
+                    message=f"Invalid product IDs: {sorted(invalid_ids)}"
                 ))
 
         if errors:
@@ -327,11 +825,21 @@ class CreateOrder(graphene.Mutation):
             )
 
         try:
+            # Snapshot unit prices so the total is computed once, here
+            order_items = [
+                OrderItem(product=products[product_id], quantity=quantity,
+                          unit_price=products[product_id].price)
+                for product_id, quantity in quantities.items()
+            ]
+            total = sum((item.unit_price * item.quantity for item in order_items), Decimal('0'))
+
             with transaction.atomic():
-                order = Order.objects.create(customer=customer)
-                order.products.set(existing_products)
-                order.total_amount = order.calculate_total()
-                order.save()
+                reserve_stock(quantities)
+                order = Order.objects.create(customer=customer, total_amount=total)
+                for item in order_items:
+                    item.order = order
+                OrderItem.objects.bulk_create(order_items)
+                invalidate(OrderItem)
 
             return CreateOrderResponse(
                 order=order,
@@ -339,6 +847,13 @@ class CreateOrder(graphene.Mutation):
                 message="Order created successfully",
                 errors=[]
             )
+        except InsufficientStock as e:
+            return CreateOrderResponse(
+                order=None,
+                success=False,
+                message="Insufficient stock",
+                errors=shortage_errors(e.shortages)
+            )
         except Exception as e:
             return CreateOrderResponse(
                 order=None,
@@ -348,20 +863,40 @@ class CreateOrder(graphene.Mutation):
             )
 
 
+class BulkCreateOrders(graphene.Mutation):
+    class Arguments:
+        orders = graphene.List(OrderInput, required=True)
+        chunk_size = graphene.Int()
+
+    Output = BulkCreateOrdersResponse
+
+    def mutate(self, info, orders, chunk_size=None):
+        created_orders, errors = bulk_create_orders(orders, chunk_size)
+
+        return BulkCreateOrdersResponse(
+            orders=created_orders,
+            success_count=len(created_orders),
+            errors=errors,
+            message=f"Successfully created {len(created_orders)} orders"
+        )
+
+
 class UpdateLowStockProducts(graphene.Mutation):
-    class Output:
-        updated_products = graphene.List(ProductType)
-        success = graphene.Boolean()
-        message = graphene.String()
+    class Arguments:
+        threshold = graphene.Int()
+        increment = graphene.Int()
+        product_ids = graphene.List(graphene.Int)
+
+    updated_products = graphene.List(ProductType)
+    success = graphene.Boolean()
+    message = graphene.String()
 
     @classmethod
-    def mutate(cls, root, info):
-        low_stock_products = Product.objects.filter(stock__lt=10)
-        updated = []
-        for product in low_stock_products:
-            product.stock += 10
-            product.save()
-            updated.append(product)
+    def mutate(cls, root, info, threshold=None, increment=None, product_ids=None):
+        if increment is not None and increment <= 0:
+            return cls(updated_products=[], success=False, message="Increment must be positive")
+
+        updated = restock_low_stock(threshold, increment, product_ids)
         return cls(
             updated_products=updated,
             success=True,
@@ -372,9 +907,16 @@ class UpdateLowStockProducts(graphene.Mutation):
 # Query Class with Filtering
 class Query(graphene.ObjectType):
     # Relay-style filtered connections
-    all_customers = DjangoFilterConnectionField(CustomerType, filterset_class=CustomerFilter)
-    all_products = DjangoFilterConnectionField(ProductType, filterset_class=ProductFilter)
-    all_orders = DjangoFilterConnectionField(OrderType, filterset_class=OrderFilter)
+    all_customers = BatchedFilterConnectionField(CustomerType, filterset_class=CustomerFilter)
+    all_products = BatchedFilterConnectionField(ProductType, filterset_class=ProductFilter)
+    all_orders = BatchedFilterConnectionField(OrderType, filterset_class=OrderFilter)
+
+    # Keyset-paginated connections for deep paging on large tables
+    all_customers_keyset = KeysetConnectionField(CustomerType, filterset_class=CustomerFilter)
+    all_products_keyset = KeysetConnectionField(ProductType, filterset_class=ProductFilter)
+    all_orders_keyset = KeysetConnectionField(
+        OrderType, filterset_class=OrderFilter, ordering=('order_date', 'id')
+    )
     
     # Simple filtered lists
     customers = graphene.List(CustomerType, filter=CustomerFilterInput())
@@ -386,58 +928,26 @@ class Query(graphene.ObjectType):
     product = graphene.Field(ProductType, id=graphene.Int(required=True))
     order = graphene.Field(OrderType, id=graphene.Int(required=True))
 
+    # Aggregates computed by the database, optionally bucketed by day or week
+    crm_stats = graphene.Field(
+        CrmStatsType,
+        required=True,
+        start=graphene.DateTime(),
+        end=graphene.DateTime(),
+        group_by=StatsGroupBy(),
+    )
+
     def resolve_customers(self, info, filter=None):
-        queryset = Customer.objects.all()
-        if filter:
-            filter_dict = {k: v for k, v in filter.items() if v is not None}
-            # Convert input field names to filter field names
-            django_filter_dict = {}
-            for key, value in filter_dict.items():
-                if key == 'name_icontains':
-                    django_filter_dict['name__icontains'] = value
-                elif key == 'email_icontains':
-                    django_filter_dict['email__icontains'] = value
-                elif key == 'phone_starts_with':
-                    django_filter_dict['phone__startswith'] = value
-                else:
-                    django_filter_dict[key] = value
-            
-            queryset = queryset.filter(**django_filter_dict)
-        return queryset
+        queryset = CUSTOMER_FILTER.apply(Customer.objects.all(), filter)
+        return resolve_list(info, optimize_queryset(queryset, info))
 
     def resolve_products(self, info, filter=None):
-        queryset = Product.objects.all()
-        if filter:
-            filter_dict = {k: v for k, v in filter.items() if v is not None}
-            django_filter_dict = {}
-            for key, value in filter_dict.items():
-                if key == 'name_icontains':
-                    django_filter_dict['name__icontains'] = value
-                elif key == 'low_stock' and value:
-                    django_filter_dict['stock__lt'] = 10
-                else:
-                    django_filter_dict[key] = value
-            
-            queryset = queryset.filter(**django_filter_dict)
-        return queryset
+        queryset = PRODUCT_FILTER.apply(Product.objects.all(), filter)
+        return resolve_list(info, optimize_queryset(queryset, info))
 
     def resolve_orders(self, info, filter=None):
-        queryset = Order.objects.select_related('customer').prefetch_related('products')
-        if filter:
-            filter_dict = {k: v for k, v in filter.items() if v is not None}
-            django_filter_dict = {}
-            for key, value in filter_dict.items():
-                if key == 'customer_name':
-                    django_filter_dict['customer__name__icontains'] = value
-                elif key == 'product_name':
-                    django_filter_dict['products__name__icontains'] = value
-                elif key == 'customer_email':
-                    django_filter_dict['customer__email__icontains'] = value
-                else:
-                    django_filter_dict[key] = value
-            
-            queryset = queryset.filter(**django_filter_dict).distinct()
-        return queryset
+        queryset = ORDER_FILTER.apply(Order.objects.all(), filter)
+        return resolve_list(info, optimize_queryset(queryset, info))
 
     def resolve_customer(self, info, id):
         try:
@@ -453,15 +963,20 @@ class Query(graphene.ObjectType):
 
     def resolve_order(self, info, id):
         try:
-            return Order.objects.select_related('customer').prefetch_related('products').get(pk=id)
+            return Order.objects.get(pk=id)
         except Order.DoesNotExist:
             return None
 
+    def resolve_crm_stats(self, info, start=None, end=None, group_by=None):
+        return crm_stats(start, end, group_by.value if group_by else None)
+
 
 # Mutation Class
 class Mutation(graphene.ObjectType):
     create_customer = CreateCustomer.Field()
     bulk_create_customers = BulkCreateCustomers.Field()
     create_product = CreateProduct.Field()
+    bulk_upsert_products = BulkUpsertProducts.Field()
     create_order = CreateOrder.Field()
+    bulk_create_orders = BulkCreateOrders.Field()
     update_low_stock_products = UpdateLowStockProducts.Field()
@@ -0,0 +1,81 @@
+import sqlite3
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+
+from .models import Customer, Product
+
+# Columns covered by full-text search, per model. Migration 0004 builds the
+# SQLite FTS tables from its own frozen copy; a change here needs a migration.
+SEARCH_FIELDS = {
+    Customer: ('name', 'email'),
+    Product: ('name',),
+}
+
+
+class BasicSearchBackend:
+    """Unranked icontains search, used where no search index is available"""
+
+    def contains(self, model, term):
+        condition = Q()
+        for field in SEARCH_FIELDS[model]:
+            condition |= Q(**{f'{field}__icontains': term})
+        return condition
+
+    def search(self, queryset, term):
+        """Filter queryset to rows matching term and annotate them with search_rank"""
+        return queryset.filter(self.contains(queryset.model, term)).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+
+class SQLiteFTSBackend(BasicSearchBackend):
+    """SQLite FTS5 search over trigram-tokenized shadow tables, ranked by bm25"""
+
+    # The trigram tokenizer cannot match anything shorter than this
+    min_length = 3
+
+    @staticmethod
+    def is_supported():
+        """Whether this SQLite has the trigram tokenizer (3.34+), and so the FTS tables"""
+        return sqlite3.sqlite_version_info >= (3, 34, 0)
+
+    def search(self, queryset, term):
+        if len(term) < self.min_length:
+            return super().search(queryset, term)
+
+        # A quoted phrase of trigrams matches the term as a substring
+        match = '"{}"'.format(term.replace('"', '""'))
+        # One MATCH, joined on rowid; every row reads its rank from the join.
+        # bm25() is lower for better matches; flip it so higher ranks first
+        return queryset.filter(search_index__document__match=match).annotate(
+            search_rank=-F('search_index__rank')
+        ).order_by('-search_rank')
+
+
+class PostgresTrigramBackend(BasicSearchBackend):
+    """pg_trgm search: GIN trigram indexes serve the icontains filter, similarity ranks it"""
+
+    def search(self, queryset, term):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        ranks = [TrigramWordSimilarity(term, field) for field in SEARCH_FIELDS[queryset.model]]
+        return queryset.filter(self.contains(queryset.model, term)).annotate(
+            search_rank=Greatest(*ranks) if len(ranks) > 1 else ranks[0]
+        ).order_by('-search_rank')
+
+
+def get_search_backend():
+    """Return the backend named by CRM_SEARCH_BACKEND, or the best one for the database"""
+    backend_path = getattr(settings, 'CRM_SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)()
+    if connection.vendor == 'postgresql':
+        return PostgresTrigramBackend()
+    if connection.vendor == 'sqlite' and SQLiteFTSBackend.is_supported():
+        return SQLiteFTSBackend()
+    return BasicSearchBackend()
+
@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Customer, Order, OrderItem, Product
+from .response_cache import invalidate
+
+
+def update_order_totals(order_ids):
+    """Recompute total_amount for the given orders in a single UPDATE"""
+    totals = (
+        OrderItem.objects.filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(total=Sum(F('quantity') * F('unit_price')))
+        .values('total')
+    )
+    Order.objects.filter(pk__in=order_ids).update(
+        total_amount=Coalesce(
+            Subquery(totals),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def order_products_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep Order.total_amount in step with the order's products"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            instance.total_amount = instance.calculate_total()
+            Order.objects.filter(pk=instance.pk).update(total_amount=instance.total_amount)
+        return
+
+    # Changed from the product side: every affected order needs a new total
+    if action == 'pre_clear':
+        instance._cleared_order_ids = list(instance.orders.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        update_order_totals(getattr(instance, '_cleared_order_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        update_order_totals(pk_set)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def order_item_changed(sender, instance, origin=None, **kwargs):
+    """Keep Order.total_amount in step with items saved or deleted one by one
+
+    Bulk writes (createOrder, bulkCreateOrders) send no signals and set
+    the total themselves.
+    """
+    if isinstance(origin, Order) or getattr(origin, 'model', None) is Order:
+        # The order itself is being deleted along with its items
+        return
+    update_order_totals([instance.order_id])
+    invalidate(Order)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Order)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_cached_results(sender, **kwargs):
+    invalidate(sender)
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_order_products(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # Membership and the recomputed totals both changed
+        invalidate(Order, OrderItem)
@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from django.db.models import Avg, Count, DecimalField, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncWeek
+
+from .models import Customer, Order
+
+CENT = Decimal('0.01')
+
+TRUNCATE = {
+    'day': TruncDay,
+    'week': TruncWeek,
+}
+
+
+def money(value):
+    return (value or Decimal('0')).quantize(CENT)
+
+
+def order_aggregates():
+    """Count/Sum/Avg over orders, computed by the database"""
+    amount = DecimalField(max_digits=12, decimal_places=2)
+    return {
+        'order_count': Count('pk'),
+        'total_revenue': Coalesce(Sum('total_amount'), Value(Decimal('0')), output_field=amount),
+        'average_order_value': Avg('total_amount', output_field=amount),
+    }
+
+
+def crm_stats(start=None, end=None, group_by=None):
+    """Customer, order and revenue totals for orders placed in [start, end)
+
+    Customers are counted by when they signed up, over the same range.
+    With group_by ('day' or 'week') the order figures are also returned
+    per period, oldest first. Every figure is a single aggregate query,
+    whatever the size of the tables.
+    """
+    customers = Customer.objects.all()
+    orders = Order.objects.all()
+    if start is not None:
+        customers = customers.filter(created_at__gte=start)
+        orders = orders.filter(order_date__gte=start)
+    if end is not None:
+        customers = customers.filter(created_at__lt=end)
+        orders = orders.filter(order_date__lt=end)
+
+    totals = orders.aggregate(**order_aggregates())
+    stats = {
+        'customer_count': customers.count(),
+        'order_count': totals['order_count'],
+        'total_revenue': money(totals['total_revenue']),
+        'average_order_value': money(totals['average_order_value']),
+        'buckets': [],
+    }
+
+    if group_by is not None:
+        buckets = (
+            orders.order_by()
+            .annotate(period=TRUNCATE[group_by]('order_date'))
+            .values('period')
+            .annotate(**order_aggregates())
+            .order_by('period')
+        )
+        stats['buckets'] = [
+            {
+                'period': bucket['period'],
+                'order_count': bucket['order_count'],
+                'total_revenue': money(bucket['total_revenue']),
+                'average_order_value': money(bucket['average_order_value']),
+            }
+            for bucket in buckets
+        ]
+
+    return stats
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When, sql
+from django.utils import timezone
+
+from .models import Product
+from .response_cache import invalidate
+
+
+class InsufficientStock(Exception):
+    """Raised when an order asks for more units than a product has in stock"""
+
+    def __init__(self, shortages):
+        # (product_id, requested, available) for every product that fell short
+        self.shortages = shortages
+        super().__init__(f"Insufficient stock for products {[s[0] for s in shortages]}")
+
+
+def supports_update_returning():
+    """Whether the database can return rows from an UPDATE statement"""
+    if connection.vendor == 'postgresql':
+        return True
+    # SQLite gained RETURNING in 3.35, the same release as bulk-insert returning
+    return connection.vendor == 'sqlite' and connection.features.can_return_rows_from_bulk_insert
+
+
+def restock_low_stock(threshold=None, increment=None, product_ids=None):
+    """Add `increment` to every product whose stock is below `threshold`
+
+    Runs as a single UPDATE relative to the current stock, so concurrent
+    writers are never overwritten, and returns the updated products.
+    """
+    threshold = getattr(settings, 'CRM_LOW_STOCK_THRESHOLD', 10) if threshold is None else threshold
+    increment = getattr(settings, 'CRM_RESTOCK_INCREMENT', 10) if increment is None else increment
+    now = timezone.now()
+
+    if not supports_update_returning():
+        with transaction.atomic():
+            queryset = Product.objects.select_for_update().filter(stock__lt=threshold)
+            if product_ids is not None:
+                queryset = queryset.filter(pk__in=product_ids)
+            ids = list(queryset.values_list('pk', flat=True))
+            Product.objects.filter(pk__in=ids).update(stock=F('stock') + increment, updated_at=now)
+            invalidate(Product)
+            return list(Product.objects.filter(pk__in=ids))
+
+    quote = connection.ops.quote_name
+    opts = Product._meta
+    columns = ', '.join(quote(field.column) for field in opts.concrete_fields)
+    stock = quote(opts.get_field('stock').column)
+    sql = (
+        f"UPDATE {quote(opts.db_table)} "
+        f"SET {stock} = {stock} + %s, {quote(opts.get_field('updated_at').column)} = %s "
+        f"WHERE {stock} < %s"
+    )
+    updated_at = opts.get_field('updated_at').get_db_prep_save(now, connection)
+    params = [increment, updated_at, threshold]
+    if product_ids is not None:
+        product_ids = list(product_ids)
+        if not product_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        sql += f" AND {quote(opts.pk.column)} IN ({placeholders})"
+        params.extend(product_ids)
+    sql += f" RETURNING {columns}"
+
+    # raw() maps the returned columns back onto Product instances with the
+    # usual field conversions; list() makes sure the statement runs once.
+    with transaction.atomic():
+        updated = list(Product.objects.raw(sql, params))
+        invalidate(Product)
+    return updated
+
+
+def update_returning_pks(queryset, values):
+    """Run queryset.update(**values) and return the primary keys it touched"""
+    query = queryset.query.chain(sql.UpdateQuery)
+    query.add_update_values(values)
+    query.clear_select_clause()
+    compiler = query.get_compiler(queryset.db)
+    compiler.pre_sql_setup()
+    update_sql, params = compiler.as_sql()
+    pk_column = connection.ops.quote_name(queryset.model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"{update_sql} RETURNING {pk_column}", params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def reserve_stock(quantities):
+    """Take the given units (product id -> quantity) out of stock in one UPDATE
+
+    Each product is only decremented if it still has enough stock at the time
+    of the statement, so concurrent orders can never oversell. Must run inside
+    the order's transaction: if any product falls short InsufficientStock is
+    raised, naming every short product, and the rollback undoes the rest.
+    """
+    if not quantities:
+        return
+    product_ids = list(quantities)
+    requested = Case(
+        *[When(pk=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=IntegerField(),
+    )
+    values = {'stock': F('stock') - requested, 'updated_at': timezone.now()}
+
+    if supports_update_returning():
+        queryset = Product.objects.filter(pk__in=product_ids, stock__gte=requested)
+        short_ids = set(product_ids) - update_returning_pks(queryset, values)
+        available = dict(
+            Product.objects.filter(pk__in=short_ids).values_list('pk', 'stock')
+        ) if short_ids else {}
+    else:
+        # Without RETURNING, lock the rows first so the check below is exact
+        available = dict(
+            Product.objects.select_for_update().filter(pk__in=product_ids).values_list('pk', 'stock')
+        )
+        short_ids = {pid for pid in product_ids if available.get(pid, 0) < quantities[pid]}
+        if not short_ids:
+            Product.objects.filter(pk__in=product_ids).update(**values)
+    invalidate(Product)
+
+    if short_ids:
+        raise InsufficientStock([
+            (product_id, quantities[product_id], available.get(product_id, 0))
+            for product_id in sorted(short_ids)
+        ])
@@ -0,0 +1,33 @@
+from itertools import islice
+
+from .loaders import get_loaders
+
+
+class ListStream:
+    """Server-side cursors for the root list fields of a streamed query
+
+    The view executes a streamed query once per chunk. On the first run a
+    root list field opens an iterator over its queryset; every later run
+    takes the next chunk from that iterator, until one comes back empty.
+    """
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self.iterators = {}
+
+    def is_streaming(self, key):
+        return key in self.iterators
+
+    def next_chunk(self, key, queryset):
+        iterator = self.iterators.get(key)
+        if iterator is None:
+            iterator = self.iterators[key] = queryset.iterator(chunk_size=self.chunk_size)
+        return list(islice(iterator, self.chunk_size))
+
+
+def resolve_list(info, queryset):
+    """Resolve a list field, one chunk at a time when it is a streamed root field"""
+    stream = getattr(info.context, 'crm_stream', None)
+    if stream is not None and info.path.prev is None:
+        queryset = stream.next_chunk(info.path.key, queryset)
+    return get_loaders(info).prime(queryset)
@@ -1,26 +1,24 @@
 from celery import shared_task
 from datetime import datetime
-from gql.transport.requests import RequestsHTTPTransport
-from gql import gql, Client
+from decimal import Decimal
+from crm.executor import get_executor
 
 @shared_task
 def generate_crm_report():
     log_file = "/tmp/crm_report_log.txt"
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     try:
-        transport = RequestsHTTPTransport(url="http://localhost:8000/graphql", verify=False)
-        client = Client(transport=transport, fetch_schema_from_transport=False)
-        query = gql('''
+        # Counted and summed by the database: one small response however many rows there are
+        query = '''
         query {
-            customers { id }
-            orders { id totalAmount }
+            crmStats { customerCount orderCount totalRevenue }
         }
-        ''')
-        result = client.execute(query)
-        num_customers = len(result.get("customers", []))
-        orders = result.get("orders", [])
-        num_orders = len(orders)
-        total_revenue = sum(float(o.get("totalAmount", 0)) for o in orders)
+        '''
+        result = get_executor().execute(query)
+        stats = result["crmStats"]
+        num_customers = stats["customerCount"]
+        num_orders = stats["orderCount"]
+        total_revenue = Decimal(stats["totalRevenue"])
         msg = f"{now} - Report: {num_customers} customers, {num_orders} orders, {total_revenue} revenue\n"
     except Exception as e:
         msg = f"{now} - Report error: {e}\n"
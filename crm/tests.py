@@ -1,3 +1,792 @@
-from django.test import TestCase
+import base64
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import DataError, connection, transaction
+from django.http import HttpRequest
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from schema import schema
+
+from .checks import check_response_cache
+from .explain import SCAN_ALLOWED, filter_plans, uses_index
+from .filters import CustomerFilter
+from .models import Customer, Order, OrderItem, Product
+from .reminders import send_order_reminders, write_checkpoint
+from .response_cache import invalidate
+from .schema import bulk_create_customers, bulk_create_products, validate_product
+from .search import BasicSearchBackend, SQLiteFTSBackend, get_search_backend
+from .stock import InsufficientStock, reserve_stock
+from .views import AsyncGraphQLView
+
+# Serves the async view for AsyncGraphQLViewTests
+urlpatterns = [path('graphql/', csrf_exempt(AsyncGraphQLView.as_view()))]
+
+# An order with everything below it, as a client rendering an order page asks
+ORDER_SHAPE = 'customer { name } products { edges { node { name } } } items { quantity product { name } }'
+
+
+def create_orders(customer, products, count):
+    for _ in range(count):
+        order = Order.objects.create(customer=customer)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=product.price)
+
+
+class ProductValidationTests(TestCase):
+    def test_rejects_prices_that_are_not_finite(self):
+        for price in ('Infinity', '-Infinity', 'NaN', 'sNaN'):
+            _, _, errors = validate_product(price, 1)
+            self.assertEqual([error.field for error in errors], ['price'], price)
+
+    def test_rejects_prices_that_do_not_fit_the_column(self):
+        for price in ('1e20', '123456789.00', '1.234'):
+            _, _, errors = validate_product(price, 1)
+            self.assertEqual([error.field for error in errors], ['price'], price)
+
+        price, _, errors = validate_product('12345678.99', 1)
+        self.assertEqual(errors, [])
+        self.assertEqual(price, Decimal('12345678.99'))
+
+    def test_bulk_create_reports_bad_prices_per_row(self):
+        created, errors = bulk_create_products([
+            {'name': 'Good', 'price': '1.50', 'stock': 1},
+            {'name': 'Infinite', 'price': 'Infinity'},
+            {'name': 'Huge', 'price': '1e20'},
+        ])
+
+        self.assertEqual([product.name for product in created], ['Good'])
+        self.assertEqual([error.index for error in errors], [1, 2])
+        # Every stored price can be read back
+        self.assertEqual(list(Product.objects.values_list('price', flat=True)), [Decimal('1.50')])
+
+    def test_database_errors_become_row_errors(self):
+        rows = [{'name': 'A', 'price': '1.00'}, {'name': 'B', 'price': '2.00'}]
+        real_save = Product.save
+
+        def save(product, *args, **kwargs):
+            if product.name == 'B':
+                raise DataError("numeric field overflow")
+            return real_save(product, *args, **kwargs)
+
+        with mock.patch.object(Product.objects, 'bulk_create', side_effect=DataError("numeric field overflow")), \
+                mock.patch.object(Product, 'save', save):
+            created, errors = bulk_create_products(rows)
+
+        self.assertEqual([product.name for product in created], ['A'])
+        self.assertEqual([(error.index, error.errors[0].field) for error in errors], [(1, 'general')])
+
+    def test_import_report_survives_bad_prices(self):
+        lines = self.import_lines('products', [
+            {'name': 'Good', 'price': '1.00'},
+            {'name': 'Infinite', 'price': 'Infinity'},
+            {'name': 'Huge', 'price': '1e20'},
+        ])
+
+        self.assertEqual(lines[-1], {'done': True, 'processed': 3, 'created': 1, 'failed': 2})
+
+    def import_lines(self, model, rows):
+        body = '\n'.join(json.dumps(row) for row in rows)
+        response = self.client.post(
+            f'/import/{model}/?format=ndjson', body, content_type='application/x-ndjson'
+        )
+        return [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+    def test_import_reports_values_of_the_wrong_type_per_row(self):
+        lines = self.import_lines('customers', [
+            {'name': "Ada", 'email': 5},
+            {'name': "Bob", 'email': "bob@example.com", 'phone': 5551234567},
+            {'email': "noname@example.com"},
+            {'name': "Cy", 'email': "cy@example.com", 'phone': ["555"]},
+            {'name': True, 'email': "true@example.com"},
+        ])
+
+        errors = {error['row']: error['errors'] for error in lines[0]['errors']}
+        self.assertEqual(lines[-1], {'done': True, 'processed': 5, 'created': 1, 'failed': 4})
+        self.assertEqual(errors[1], [{'field': 'email', 'message': "Invalid email format"}])
+        self.assertEqual(errors[3], [{'field': 'name', 'message': "Name is required"}])
+        wrong_type = "Field {!r} must be a string or a number"
+        self.assertEqual(errors[4], [{'field': 'general', 'message': wrong_type.format('phone')}])
+        self.assertEqual(errors[5], [{'field': 'general', 'message': wrong_type.format('name')}])
+        # Numbers keep their text: the phone number is stored as sent
+        self.assertEqual(Customer.objects.get().phone, "5551234567")
+
+        lines = self.import_lines('products', [{'name': 7, 'price': 1.10, 'stock': 3}])
+        self.assertEqual(lines[-1], {'done': True, 'processed': 1, 'created': 1, 'failed': 0})
+        self.assertEqual(
+            list(Product.objects.values_list('name', 'price', 'stock')), [("7", Decimal('1.10'), 3)]
+        )
+
+
+class CustomerImportTests(TestCase):
+    def test_rejects_values_longer_than_their_columns(self):
+        created, errors = bulk_create_customers([
+            {'name': "A" * 101, 'email': "long-name@example.com"},
+            {'name': "Bob", 'email': "bob@example.com", 'phone': "call me on 555-123-4567 please"},
+            {'name': "Cy", 'email': "cy@example.com", 'phone': "555-123-4567"},
+        ])
+
+        self.assertEqual([customer.name for customer in created], ["Cy"])
+        self.assertEqual(
+            [(error.index, [e.field for e in error.errors]) for error in errors], [(0, ['name']), (1, ['phone'])]
+        )
+
+    def test_database_errors_become_row_errors(self):
+        rows = [{'name': "Ada", 'email': "ada@example.com"}, {'name': "Bob", 'email': "bob@example.com"}]
+        real_save = Customer.save
+
+        def save(customer, *args, **kwargs):
+            if customer.name == "Bob":
+                raise DataError("value too long for type character varying(20)")
+            return real_save(customer, *args, **kwargs)
+
+        with mock.patch.object(Customer.objects, 'bulk_create', side_effect=DataError("value too long")), \
+                mock.patch.object(Customer, 'save', save):
+            created, errors = bulk_create_customers(rows)
+
+        self.assertEqual([customer.name for customer in created], ["Ada"])
+        self.assertEqual([(error.index, error.errors[0].field) for error in errors], [(1, 'general')])
+
+
+class OrderInputTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        self.product = Product.objects.create(name="Widget", price=Decimal('2.00'), stock=10)
+
+    def test_bulk_create_orders_reports_null_product_ids_per_row(self):
+        result = schema.execute(
+            """
+            mutation($orders: [OrderInput]!) {
+              bulkCreateOrders(orders: $orders) {
+                successCount
+                errors { index errors { field message } }
+              }
+            }
+            """,
+            variable_values={'orders': [
+                {'customerId': self.customer.pk, 'productIds': [None, 99999]},
+                {'customerId': self.customer.pk, 'productIds': [self.product.pk]},
+            ]},
+        )
+
+        self.assertIsNone(result.errors)
+        data = result.data['bulkCreateOrders']
+        self.assertEqual(data['successCount'], 1)
+        self.assertEqual([error['index'] for error in data['errors']], [0])
+        self.assertEqual(
+            [error['message'] for error in data['errors'][0]['errors']],
+            ["Product IDs cannot be null", "Invalid product IDs: [99999]"],
+        )
+
+    def test_create_order_rejects_null_product_ids(self):
+        result = schema.execute(
+            """
+            mutation($customerId: Int!, $productIds: [Int]) {
+              createOrder(customerId: $customerId, productIds: $productIds) {
+                success
+                errors { field message }
+              }
+            }
+            """,
+            variable_values={'customerId': self.customer.pk, 'productIds': [None, 99999]},
+        )
+
+        self.assertIsNone(result.errors)
+        self.assertFalse(result.data['createOrder']['success'])
+        self.assertEqual(Order.objects.count(), 0)
+
+
+class ReserveStockTests(TestCase):
+    def setUp(self):
+        self.widget = Product.objects.create(name="Widget", price=Decimal('2.00'), stock=5)
+        self.gadget = Product.objects.create(name="Gadget", price=Decimal('3.00'), stock=1)
+
+    def assertStock(self, widget, gadget):
+        self.widget.refresh_from_db()
+        self.gadget.refresh_from_db()
+        self.assertEqual((self.widget.stock, self.gadget.stock), (widget, gadget))
+
+    def check_reservation(self):
+        with transaction.atomic():
+            reserve_stock({self.widget.pk: 2, self.gadget.pk: 1})
+        self.assertStock(3, 0)
+
+        with self.assertRaises(InsufficientStock) as raised:
+            with transaction.atomic():
+                reserve_stock({self.widget.pk: 3, self.gadget.pk: 2})
+        # Every short product is named, and the rollback undoes the rest
+        self.assertEqual(raised.exception.shortages, [(self.gadget.pk, 2, 0)])
+        self.assertStock(3, 0)
+
+    def test_reserves_with_update_returning(self):
+        self.check_reservation()
+
+    def test_reserves_with_row_locks(self):
+        with mock.patch('crm.stock.supports_update_returning', return_value=False):
+            self.check_reservation()
+
+    def test_create_order_reports_the_shortage(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        result = schema.execute(
+            """
+            mutation($customerId: Int!, $productId: Int!) {
+              createOrder(customerId: $customerId, items: [{productId: $productId, quantity: 4}]) {
+                success
+                message
+                errors { field message }
+              }
+            }
+            """,
+            variable_values={'customerId': customer.pk, 'productId': self.gadget.pk},
+        )
+
+        self.assertEqual(result.data['createOrder'], {
+            'success': False,
+            'message': "Insufficient stock",
+            'errors': [{
+                'field': 'items',
+                'message': f"Insufficient stock for product {self.gadget.pk}: requested 4, available 1",
+            }],
+        })
+        self.assertEqual(Order.objects.count(), 0)
+        self.assertStock(5, 1)
+
+
+class ResponseCacheTests(TestCase):
+    query = '{ products { name stock } }'
+
+    def setUp(self):
+        # A file cache stands in for the shared backend production needs
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        settings = override_settings(
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'results': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': location,
+                },
+            },
+            CRM_RESPONSE_CACHE='results',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.product = Product.objects.create(name="Widget", price=Decimal('2.00'), stock=10)
+
+    def products(self):
+        response = self.client.post('/graphql/', {'query': self.query}, content_type='application/json')
+        return response.json()['data']['products']
+
+    def test_save_signals_invalidate(self):
+        self.assertEqual(self.products(), [{'name': "Widget", 'stock': 10}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.stock = 4
+            self.product.save()
+
+        self.assertEqual(self.products(), [{'name': "Widget", 'stock': 4}])
+
+    def test_writes_bypassing_signals_need_invalidate(self):
+        self.assertEqual(self.products(), [{'name': "Widget", 'stock': 10}])
+
+        Product.objects.filter(pk=self.product.pk).update(stock=4)
+        # update() sends no signal, so the cached result is still served
+        self.assertEqual(self.products(), [{'name': "Widget", 'stock': 10}])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate(Product)
+
+        self.assertEqual(self.products(), [{'name': "Widget", 'stock': 4}])
+
+    def test_checks_the_cache_alias(self):
+        with override_settings(CRM_RESPONSE_CACHE='default'):
+            self.assertEqual([message.id for message in check_response_cache(None)], ['crm.W001'])
+        with override_settings(CRM_RESPONSE_CACHE='missing'):
+            self.assertEqual([message.id for message in check_response_cache(None)], ['crm.E001'])
+        self.assertEqual(check_response_cache(None), [])
+
+    def test_a_per_process_cache_still_serves(self):
+        # Allowed for local testing: writes and queries must keep working
+        with override_settings(CRM_RESPONSE_CACHE='default'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Customer.objects.create(name="Ada", email="ada@example.com")
+            response = self.client.post('/graphql/', {'query': '{ hello }'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+
+
+class FilterPlanTests(TestCase):
+    def test_filters_use_indexes(self):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.skipTest(f"Can't read {connection.vendor} query plans")
+
+        scans = [label for label, plan in filter_plans() if not uses_index(plan)]
+
+        self.assertEqual(sorted(set(scans) - SCAN_ALLOWED), [])
+
+
+class QueryCostTests(TestCase):
+    def cost(self, query):
+        response = self.client.post('/graphql/', {'query': query}, content_type='application/json')
+        return response.json()
+
+    def test_nested_lists_without_page_sizes_are_accepted(self):
+        for query in [
+            '{ customers { name orders { edges { node { totalAmount items { quantity product { name } } } } } } }',
+            '{ allCustomers(first: 50) { edges { node { name orders { edges { node { totalAmount '
+            'products { edges { node { name } } } } } } } } } }',
+        ]:
+            body = self.cost(query)
+            self.assertNotIn('errors', body, query)
+            self.assertLessEqual(body['extensions']['cost']['estimated'], body['extensions']['cost']['max_cost'])
+
+    def test_explicit_page_sizes_still_count(self):
+        body = self.cost(
+            '{ allCustomers(first: 100) { edges { node { orders(first: 100) { edges { node { '
+            'items { product { name } } } } } } } } }'
+        )
+
+        # 100 customers x 100 orders x 10 items (the nested default) x their product
+        self.assertEqual(body['errors'], [{
+            'message': f"Query cost {100 * (1 + 100 * (1 + 10 * 2))} exceeds the limit of 50000",
+            'locations': [{'line': 1, 'column': 1}],
+            'extensions': {'code': 'QUERY_TOO_COMPLEX'},
+        }])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.ada = Customer.objects.create(name="Ada Lovelace", email="ada@example.com")
+        Customer.objects.create(name="Grace Hopper", email="grace@navy.mil")
+        self.widget = Product.objects.create(name="Blue widget", price=Decimal('2.00'), stock=10)
+        Product.objects.create(name="Red gadget", price=Decimal('3.00'), stock=10)
+        order = Order.objects.create(customer=self.ada)
+        OrderItem.objects.create(order=order, product=self.widget, unit_price=self.widget.price)
+
+    def search(self, field, value, selection='name'):
+        result = schema.execute(
+            f'query($search: String) {{ {field}(filter: {{search: $search}}) {{ {selection} }} }}',
+            variable_values={'search': value},
+        )
+        self.assertIsNone(result.errors)
+        return result.data[field]
+
+    def test_filter_inputs_take_search(self):
+        self.assertEqual(self.search('customers', "lovelace"), [{'name': "Ada Lovelace"}])
+        self.assertEqual(self.search('products', "widget"), [{'name': "Blue widget"}])
+        self.assertEqual(
+            self.search('orders', "widget", 'customer { name }'), [{'customer': {'name': "Ada Lovelace"}}]
+        )
+
+    def test_renames_are_indexed(self):
+        self.widget.name = "Green sprocket"
+        self.widget.save()
+        Product.objects.filter(pk=self.widget.pk).update(stock=3)
+
+        self.assertEqual(self.search('products', "widget"), [])
+        self.assertEqual(self.search('products', "sprocket"), [{'name': "Green sprocket"}])
+
+    def test_many_matches_run_one_match(self):
+        if not isinstance(get_search_backend(), SQLiteFTSBackend):
+            self.skipTest("SQLite FTS only")
+        Customer.objects.bulk_create([
+            Customer(name=f"Smith {i}", email=f"smith{i}@example.com") for i in range(3000)
+        ])
+        Customer.objects.create(name="Smith", email="smith@example.com")
+
+        with CaptureQueriesContext(connection) as queries:
+            top = self.search('customers', "smith")[:1]
+        # The MATCH is joined once, not rerun per matching row to rank it
+        self.assertEqual([query['sql'].count('MATCH') for query in queries], [1])
+        self.assertEqual(top, [{'name': "Smith"}])
+        self.assertEqual(
+            CustomerFilter(data={'search': "smith"}, queryset=Customer.objects.all()).qs.count(), 3001
+        )
+
+    def test_old_sqlite_falls_back_to_icontains(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest("SQLite only")
+        self.assertIsInstance(get_search_backend(), SQLiteFTSBackend)
+
+        with mock.patch('crm.search.sqlite3.sqlite_version_info', (3, 31, 1)):
+            self.assertIs(type(get_search_backend()), BasicSearchBackend)
+            self.assertEqual(self.search('products', "widget"), [{'name': "Blue widget"}])
+
+
+class ReminderCheckpointTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.log_file = f'{directory}/reminders.log'
+        self.checkpoint_file = f'{directory}/checkpoint.json'
+        self.now = timezone.now()
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        self.order = Order.objects.create(customer=customer)
+
+    def leave_checkpoint(self, run):
+        # A crashed run that got past this morning's order
+        write_checkpoint(
+            self.checkpoint_file, run, self.now - timedelta(days=7),
+            (self.order.order_date, self.order.pk), 4,
+        )
+
+    def test_resumes_a_checkpoint_from_the_same_day(self):
+        self.leave_checkpoint(timezone.localdate(self.now))
+
+        sent = send_order_reminders(self.log_file, self.checkpoint_file, now=self.now)
+
+        self.assertEqual(sent, 4)
+
+    def test_discards_a_checkpoint_from_an_earlier_run(self):
+        self.leave_checkpoint(timezone.localdate(self.now) - timedelta(days=1))
+
+        sent = send_order_reminders(self.log_file, self.checkpoint_file, now=self.now)
+
+        self.assertEqual(sent, 1)
+        with open(self.log_file) as f:
+            self.assertIn("Customer Email: ada@example.com", f.read())
+
+
+class BulkUpsertProductsTests(TestCase):
+    def upsert(self, products):
+        result = schema.execute(
+            """
+            mutation($products: [ProductUpsertInput]!) {
+              bulkUpsertProducts(products: $products) {
+                createdCount updatedCount unchangedCount
+                errors { index errors { field message } }
+              }
+            }
+            """,
+            variable_values={'products': products},
+        )
+        self.assertIsNone(result.errors)
+        return result.data['bulkUpsertProducts']
+
+    def test_rows_without_stock_keep_the_inventory(self):
+        self.upsert([{'sku': 'W-1', 'name': "Widget", 'price': '2.00', 'stock': 40}])
+
+        # A catalogue sync that only knows names and prices
+        counts = self.upsert([
+            {'sku': 'W-1', 'name': "Widget", 'price': '2.00'},
+            {'sku': 'G-1', 'name': "Gadget", 'price': '3.00', 'stock': None},
+        ])
+        self.assertEqual(counts, {'createdCount': 1, 'updatedCount': 0, 'unchangedCount': 1, 'errors': []})
+
+        self.upsert([{'sku': 'W-1', 'name': "Blue widget", 'price': '2.50'}])
+        self.assertEqual(
+            sorted(Product.objects.values_list('sku', 'name', 'price', 'stock')),
+            [('G-1', "Gadget", Decimal('3.00'), 0), ('W-1', "Blue widget", Decimal('2.50'), 40)],
+        )
+
+    def test_rows_with_stock_update_it(self):
+        self.upsert([{'sku': 'W-1', 'name': "Widget", 'price': '2.00', 'stock': 40}])
+
+        counts = self.upsert([{'sku': 'W-1', 'name': "Widget", 'price': '2.00', 'stock': 0}])
+
+        self.assertEqual(counts, {'createdCount': 0, 'updatedCount': 1, 'unchangedCount': 0, 'errors': []})
+        self.assertEqual(Product.objects.get(sku='W-1').stock, 0)
+
+    def test_database_errors_become_row_errors(self):
+        self.upsert([{'sku': 'W-1', 'name': "Widget", 'price': '2.00', 'stock': 40}])
+        real_bulk_create = Product.objects.bulk_create
+
+        def bulk_create(products, **kwargs):
+            if any(product.sku == 'BAD' for product in products):
+                raise DataError("value too long for type character varying(64)")
+            return real_bulk_create(products, **kwargs)
+
+        with mock.patch.object(Product.objects, 'bulk_create', bulk_create):
+            counts = self.upsert([
+                {'sku': 'W-1', 'name': "Blue widget", 'price': '2.00', 'stock': 40},
+                {'sku': 'BAD', 'name': "Bad", 'price': '1.00', 'stock': 1},
+                {'sku': 'G-1', 'name': "Gadget", 'price': '3.00', 'stock': 1},
+            ])
+
+        self.assertEqual(counts['createdCount'], 1)
+        self.assertEqual(counts['updatedCount'], 1)
+        self.assertEqual(
+            [(error['index'], error['errors'][0]['field']) for error in counts['errors']], [(1, 'general')]
+        )
+        self.assertEqual(
+            sorted(Product.objects.values_list('sku', 'name')), [('G-1', "Gadget"), ('W-1', "Blue widget")]
+        )
+
+
+class OrderTotalTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        self.product = Product.objects.create(name="Widget", price=Decimal('2.00'), stock=10)
+        self.order = Order.objects.create(customer=customer)
+
+    def assertTotal(self, total):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_amount, Decimal(total))
+
+    def test_item_writes_update_the_total(self):
+        item = OrderItem.objects.create(order=self.order, product=self.product, quantity=3, unit_price='2.00')
+        self.assertTotal('6.00')
+
+        item.quantity = 5
+        item.save()
+        self.assertTotal('10.00')
+
+        item.delete()
+        self.assertTotal('0.00')
+
+    def test_deleting_a_product_updates_its_orders(self):
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=3, unit_price='2.00')
+        self.assertTotal('6.00')
+
+        self.product.delete()
+
+        self.assertTotal('0.00')
+
+    def test_deleting_an_order_skips_its_total(self):
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=3, unit_price='2.00')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.order.delete()
+
+        # No total is recomputed for an order on its way out
+        self.assertEqual([query['sql'] for query in queries if query['sql'].startswith('UPDATE')], [])
+        self.assertFalse(Order.objects.exists())
+
+
+class QueryOptimizerTests(TestCase):
+    def setUp(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        products = [
+            Product.objects.create(name="Widget", price=Decimal('2.00'), stock=10),
+            Product.objects.create(name="Gadget", price=Decimal('3.00'), stock=10),
+        ]
+        create_orders(customer, products, 3)
+
+    def execute(self, query, num_queries):
+        with self.assertNumQueries(num_queries), CaptureQueriesContext(connection) as queries:
+            result = schema.execute(query)
+        self.assertIsNone(result.errors)
+        return result.data, [query['sql'] for query in queries]
+
+    def assertOrders(self, orders):
+        self.assertEqual(len(orders), 3)
+        for order in orders:
+            self.assertEqual(order['customer'], {'name': "Ada"})
+            self.assertEqual(
+                sorted(edge['node']['name'] for edge in order['products']['edges']), ["Gadget", "Widget"]
+            )
+            self.assertEqual(sorted(item['product']['name'] for item in order['items']), ["Gadget", "Widget"])
+
+    def test_list_field_prefetches_the_selection(self):
+        # orders joined to customer, products, items joined to product
+        data, _ = self.execute('{ orders { %s } }' % ORDER_SHAPE, 3)
+        self.assertOrders(data['orders'])
+
+    def test_connection_field_prefetches_the_selection(self):
+        # The same three plus the connection's count
+        data, _ = self.execute('{ allOrders { edges { node { %s } } } }' % ORDER_SHAPE, 4)
+        self.assertOrders([edge['node'] for edge in data['allOrders']['edges']])
+
+    def test_reads_only_the_selected_columns(self):
+        _, [sql] = self.execute('{ orders { id totalAmount } }', 1)
+        self.assertEqual(sql, 'SELECT "crm_order"."id", "crm_order"."total_amount" FROM "crm_order"')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        # Created out of timestamp order, so ids alone don't give the ordering;
+        # B, C and D share a timestamp and the id has to break the tie.
+        names = ["E", "B", "C", "D", "A"]
+        products = [Product.objects.create(name=name, price=Decimal('1.00')) for name in names]
+        now = timezone.now()
+        for offset, product in zip([2, 0, 0, 0, -2], products):
+            product.created_at = now + timedelta(seconds=offset)
+        Product.objects.bulk_update(products, ['created_at'])
+
+    def page(self, **args):
+        result = schema.execute(
+            """
+            query($first: Int, $last: Int, $after: String, $before: String) {
+              allProductsKeyset(first: $first, last: $last, after: $after, before: $before) {
+                edges { node { name } }
+                pageInfo { hasNextPage hasPreviousPage startCursor endCursor }
+              }
+            }
+            """,
+            variable_values=args,
+        )
+        if result.errors:
+            return [error.message for error in result.errors]
+        connection = result.data['allProductsKeyset']
+        return [edge['node']['name'] for edge in connection['edges']], connection['pageInfo']
+
+    def test_pages_forward_with_after(self):
+        pages, cursor = [], None
+        while True:
+            with self.assertNumQueries(1):
+                names, info = self.page(first=2, after=cursor)
+            pages.append((names, info['hasPreviousPage'], info['hasNextPage']))
+            if not info['hasNextPage']:
+                break
+            cursor = info['endCursor']
+
+        self.assertEqual(pages, [
+            (["A", "B"], False, True),
+            (["C", "D"], True, True),
+            (["E"], True, False),
+        ])
+
+    def test_pages_backward_with_before(self):
+        pages, cursor = [], None
+        while True:
+            names, info = self.page(last=2, before=cursor)
+            pages.append((names, info['hasPreviousPage'], info['hasNextPage']))
+            if not info['hasPreviousPage']:
+                break
+            cursor = info['startCursor']
+
+        self.assertEqual(pages, [
+            (["D", "E"], True, False),
+            (["B", "C"], True, True),
+            (["A"], False, True),
+        ])
+
+    def test_rejects_invalid_cursors(self):
+        self.assertEqual(self.page(first=2, after="not-a-cursor"), ["Invalid cursor: not-a-cursor"])
+        # Well-formed base64, but not a cursor for this ordering
+        cursor = base64.urlsafe_b64encode(b'["x"]').decode()
+        self.assertEqual(self.page(last=2, before=cursor), [f"Invalid cursor: {cursor}"])
+
+    def test_rejects_first_with_last(self):
+        self.assertEqual(self.page(first=2, last=2), ["Use either first or last, not both"])
+
+
+@override_settings(CRM_STREAM_CHUNK_SIZE=2)
+class StreamedQueryTests(TestCase):
+    def setUp(self):
+        for name in ["Ada", "Bob", "Cy", "Di", "Ed"]:
+            Customer.objects.create(name=name, email=f"{name.lower()}@example.com")
+
+    def stream(self, query):
+        response = self.client.post('/graphql/?stream=true', {'query': query}, content_type='application/json')
+        self.assertTrue(response.streaming)
+        parts = [part.decode() for part in response.streaming_content]
+        return json.loads(''.join(parts)), parts
+
+    def test_root_lists_are_written_chunk_by_chunk(self):
+        body, parts = self.stream('{ customers { name } hello }')
+
+        self.assertEqual(body['data'], {
+            'customers': [{'name': name} for name in ["Ada", "Bob", "Cy", "Di", "Ed"]],
+            'hello': "Hello, GraphQL!",
+        })
+        self.assertNotIn('errors', body)
+        # Five customers in chunks of two
+        self.assertEqual([part.count('"name"') for part in parts if '"name"' in part], [2, 2, 1])
+
+    def test_error_paths_count_the_items_already_sent(self):
+        body, _ = self.stream('{ customers { name orders(first: 100000) { edges { node { id } } } } }')
+
+        # orders is non-null, so each failing customer is nulled
+        self.assertEqual(body['data'], {'customers': [None] * 5})
+        self.assertEqual(
+            [error['path'] for error in body['errors']], [['customers', i, 'orders'] for i in range(5)]
+        )
+
+
+class RelationLoaderTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        self.products = [
+            Product.objects.create(name="Widget", price=Decimal('2.00'), stock=10),
+            Product.objects.create(name="Gadget", price=Decimal('3.00'), stock=10),
+        ]
+
+    def customer_orders(self):
+        # A single-object root isn't optimized, so everything below it is
+        # left to the loaders
+        result = schema.execute(
+            'query($id: Int!) { customer(id: $id) { orders { edges { node { %s } } } } }' % ORDER_SHAPE,
+            variable_values={'id': self.customer.pk},
+            context_value=HttpRequest(),
+        )
+        self.assertIsNone(result.errors)
+        return [edge['node'] for edge in result.data['customer']['orders']['edges']]
+
+    def test_nested_relations_cost_one_query_per_level(self):
+        for count in (2, 5):
+            Order.objects.all().delete()
+            create_orders(self.customer, self.products, count)
+
+            # customer, its orders, their customers, products, items, item products
+            with self.assertNumQueries(6):
+                orders = self.customer_orders()
+
+            self.assertEqual(len(orders), count)
+            for order in orders:
+                self.assertEqual(order['customer'], {'name': "Ada"})
+                self.assertEqual(
+                    sorted(edge['node']['name'] for edge in order['products']['edges']), ["Gadget", "Widget"]
+                )
+                self.assertEqual(
+                    sorted(item['product']['name'] for item in order['items']), ["Gadget", "Widget"]
+                )
+
+    def test_loaders_are_not_shared_between_requests(self):
+        create_orders(self.customer, self.products[:1], 1)
+        self.customer_orders()
+
+        self.products[0].name = "Sprocket"
+        self.products[0].save()
+
+        [order] = self.customer_orders()
+        self.assertEqual(order['items'][0]['product']['name'], "Sprocket")
+
+
+@override_settings(ROOT_URLCONF='crm.tests')
+class AsyncGraphQLViewTests(TransactionTestCase):
+    query = '{ products { name } hello customers { name orders { edges { node { totalAmount } } } } }'
+
+    def setUp(self):
+        customer = Customer.objects.create(name="Ada", email="ada@example.com")
+        product = Product.objects.create(name="Widget", price=Decimal('2.00'), stock=10)
+        order = Order.objects.create(customer=customer)
+        OrderItem.objects.create(order=order, product=product, quantity=3, unit_price=product.price)
+        self.expected = {
+            'products': [{'name': "Widget"}],
+            'hello': "Hello, GraphQL!",
+            'customers': [{'name': "Ada", 'orders': {'edges': [{'node': {'totalAmount': "6.00"}}]}}],
+        }
+
+    async def post(self):
+        executor = AsyncGraphQLView.root_field_executor
+        with mock.patch.object(executor, 'submit', wraps=executor.submit) as submit:
+            response = await self.async_client.post(
+                '/graphql/', {'query': self.query}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json(), submit.call_count
+
+    @override_settings(CRM_GRAPHQL_ROOT_FIELD_CONCURRENCY=2)
+    async def test_root_fields_share_the_capped_fan_out(self):
+        body, submitted = await self.post()
+
+        # Three root fields over two threads: one runs on the request's own
+        self.assertEqual(submitted, 1)
+        self.assertEqual(body['data'], self.expected)
+        self.assertEqual(list(body['data']), ['products', 'hello', 'customers'])
+
+    @override_settings(CRM_GRAPHQL_ROOT_FIELD_CONCURRENCY=1)
+    async def test_concurrency_of_one_stays_on_the_request_thread(self):
+        body, submitted = await self.post()
+
+        self.assertEqual(submitted, 0)
+        self.assertEqual(body['data'], self.expected)
@@ -0,0 +1,59 @@
+import re
+
+# Shared by the model's RegexValidator, Customer.clean() and the mutations
+PHONE_PATTERN = r'^\+?1?\d{9,15}$|^\d{3}-\d{3}-\d{4}$'
+PHONE_MESSAGE = "Phone number must be in format: '+999999999' or '999-999-9999'"
+
+PHONE_RE = re.compile(PHONE_PATTERN)
+# Everything but digits, '+' and '-' is ignored when checking a phone number
+PHONE_NOISE_RE = re.compile(r'[^\d+\-]')
+EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+EMAIL_ERROR = ('email', "Invalid email format")
+PHONE_ERROR = ('phone', "Invalid phone number format")
+
+
+def validate_email(email):
+    """Validate email format"""
+    return EMAIL_RE.match(email) is not None
+
+
+def validate_phone(phone):
+    """Validate phone number format; a missing phone is valid"""
+    if not phone:
+        return True
+    return PHONE_RE.match(phone) is not None or PHONE_RE.match(PHONE_NOISE_RE.sub('', phone)) is not None
+
+
+def validate_emails(emails):
+    """Validate a column of emails, returning a list of booleans"""
+    return [match is not None for match in map(EMAIL_RE.match, [email or '' for email in emails])]
+
+
+def validate_phones(phones):
+    """Validate a column of phone numbers, returning a list of booleans"""
+    match = PHONE_RE.match
+    clean = PHONE_NOISE_RE.sub
+    # Most numbers match as typed, which skips the substitution; a number
+    # that matches as typed has nothing left to strip but a final newline.
+    return [
+        not phone or match(phone) is not None or match(clean('', phone)) is not None
+        for phone in phones
+    ]
+
+
+# The errors of a row, by (email valid, phone valid); shared, so never mutate them
+ROW_ERRORS = {
+    (True, True): (),
+    (False, True): (EMAIL_ERROR,),
+    (True, False): (PHONE_ERROR,),
+    (False, False): (EMAIL_ERROR, PHONE_ERROR),
+}
+
+
+def customer_errors(emails, phones):
+    """Validate the email and phone columns of a customer batch
+
+    Returns one tuple of (field, message) per row, empty for valid rows.
+    """
+    return list(map(ROW_ERRORS.__getitem__, zip(validate_emails(emails), validate_phones(phones))))
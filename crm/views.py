@@ -1,3 +1,647 @@
-from django.shortcuts import render
+import asyncio
+import csv
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+from itertools import islice
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connection, transaction
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import (
+    DocumentNode,
+    ExecutionResult,
+    FieldNode,
+    FragmentDefinitionNode,
+    GraphQLError,
+    OperationType,
+    SelectionSetNode,
+    execute,
+    get_operation_ast,
+    parse,
+)
+from graphql.execution.middleware import MiddlewareManager
+from graphql.validation import validate
+
+from .cost import CostCounter, QueryCostRule
+from .response_cache import ResponsePlan, get_cache
+from .schema import bulk_create_customers, bulk_create_products
+from .streaming import ListStream
+
+IMPORTERS = {
+    'customers': bulk_create_customers,
+    'products': bulk_create_products,
+}
+
+FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonlines': 'ndjson',
+}
+
+
+def iter_lines(stream):
+    """Decode the request body line by line without buffering it"""
+    for line in stream:
+        yield line.decode('utf-8')
+
+
+def parse_csv(lines):
+    yield from csv.DictReader(lines)
+
+
+def parse_ndjson(lines):
+    """Parse NDJSON rows into what CSV rows hold: strings, or None for null
+
+    Numbers keep their source text, so a price is never rounded through a
+    float; any other value is reported as a row error.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line, parse_int=str, parse_float=str, parse_constant=str)
+        except ValueError as e:
+            yield f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield "Row must be a JSON object"
+            continue
+        invalid = [key for key, value in row.items() if value is not None and not isinstance(value, str)]
+        yield f"Field {invalid[0]!r} must be a string or a number" if invalid else row
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ndjson': parse_ndjson,
+}
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def import_report(importer, rows, batch_size):
+    """Import rows batch by batch, yielding one NDJSON progress line per batch
+
+    Rows are only pulled from the request once the previous progress line has
+    been consumed, so a slow client throttles the import instead of letting
+    it buffer.
+    """
+    processed = created = failed = 0
+    for batch_number, batch in enumerate(batched(enumerate(rows, start=1), batch_size), start=1):
+        errors = []
+        valid_rows = []
+        row_numbers = []
+        for row_number, row in batch:
+            if isinstance(row, str):
+                errors.append({'row': row_number, 'errors': [{'field': 'general', 'message': row}]})
+            else:
+                valid_rows.append(row)
+                row_numbers.append(row_number)
+
+        created_objects, row_errors = importer(valid_rows, batch_size)
+        for error in row_errors:
+            errors.append({
+                'row': row_numbers[error.index],
+                'errors': [{'field': e.field, 'message': e.message} for e in error.errors],
+            })
+        errors.sort(key=lambda error: error['row'])
+
+        processed += len(batch)
+        created += len(created_objects)
+        failed += len(errors)
+        yield json.dumps({
+            'batch': batch_number,
+            'processed': processed,
+            'created': created,
+            'failed': failed,
+            'errors': errors,
+        }) + '\n'
+
+    yield json.dumps({
+        'done': True,
+        'processed': processed,
+        'created': created,
+        'failed': failed,
+    }) + '\n'
+
+
+@require_POST
+def import_rows(request, model):
+    """Stream a CSV or NDJSON upload of customers or products into the database"""
+    importer = IMPORTERS.get(model)
+    if importer is None:
+        return HttpResponseBadRequest(f"Unknown import type: {model}")
+
+    data_format = request.GET.get('format') or FORMATS.get(request.content_type)
+    parser = PARSERS.get(data_format)
+    if parser is None:
+        return HttpResponseBadRequest("Use format=csv or format=ndjson")
+
+    default_batch_size = getattr(settings, 'CRM_IMPORT_BATCH_SIZE', 1000)
+    max_batch_size = getattr(settings, 'CRM_IMPORT_MAX_BATCH_SIZE', 10000)
+    try:
+        batch_size = int(request.GET.get('batch_size') or default_batch_size)
+    except ValueError:
+        return HttpResponseBadRequest("batch_size must be an integer")
+    batch_size = max(1, min(batch_size, max_batch_size))
+
+    rows = parser(iter_lines(request))
+    return StreamingHttpResponse(
+        import_report(importer, rows, batch_size),
+        content_type='application/x-ndjson'
+    )
+
+
+class DocumentCache:
+    """Thread-safe LRU of parsed and validated GraphQL documents, keyed by query hash
+
+    Each entry remembers how long parsing and validation took on the miss
+    that stored it, so hits can report the time they saved.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            document, cost = entry
+            self.seconds_saved += cost
+            return document
+
+    def set(self, key, document, cost):
+        with self.lock:
+            self.entries[key] = (document, cost)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+            self.seconds_saved = 0.0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'seconds_saved': self.seconds_saved,
+            }
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def response_key(field_node):
+    return (field_node.alias or field_node.name).value
+
+
+def root_field_groups(operation_ast):
+    """Split a query's root selections by response key, or [] if they can't be split
+
+    Fields sharing a response key are merged by the executor, so they stay
+    in one group. Fragments at the root are left to a single execution.
+    """
+    if operation_ast is None or operation_ast.operation != OperationType.QUERY:
+        return []
+    groups = OrderedDict()
+    for selection in operation_ast.selection_set.selections:
+        if not isinstance(selection, FieldNode):
+            return []
+        groups.setdefault(response_key(selection), []).append(selection)
+    return list(groups.values())
+
+
+def select_fields(document, operation_ast, fields):
+    """A copy of document whose operation selects only fields at the root"""
+    operation = copy(operation_ast)
+    operation.selection_set = SelectionSetNode(selections=tuple(fields))
+    fragments = [
+        definition for definition in document.definitions
+        if isinstance(definition, FragmentDefinitionNode)
+    ]
+    return DocumentNode(definitions=(operation, *fragments))
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+async def iterate_in_thread(iterator):
+    """Consume a blocking iterator from async code, always on the same thread
+
+    A streamed query reads from a database cursor, which belongs to the
+    connection of the thread that opened it.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='graphql-stream')
+    try:
+        while (part := await loop.run_in_executor(executor, next, iterator, None)) is not None:
+            yield part
+    finally:
+        await loop.run_in_executor(executor, close_old_connections)
+        executor.shutdown(wait=False)
+
+
+class CachedGraphQLView(GraphQLView):
+    """GraphQLView that reuses parsed and validated documents across requests
+
+    Also implements Automatic Persisted Queries: a client may send only
+    extensions.persistedQuery.sha256Hash, and sends the full query once
+    when the server answers PersistedQueryNotFound. Query text lives in
+    the CRM_PERSISTED_QUERY_CACHE cache, so it is only shared between
+    workers when that cache is.
+
+    With CRM_RESPONSE_CACHE set, results of error-free queries (never
+    mutations) are cached, keyed on the normalized query, the variables
+    and the current generation of every model the query reads.
+
+    Every operation is checked against the cost and depth budgets of
+    QueryCostRule before it runs; the estimated and actual cost are
+    returned in the response's extensions.
+
+    A query sent with stream=true is answered with a StreamingHttpResponse.
+    Its root list fields are read through a server-side cursor and written
+    out chunk by chunk, so exports of any size run in flat memory.
+    """
+
+    document_cache = DocumentCache(getattr(settings, 'CRM_GRAPHQL_DOCUMENT_CACHE_SIZE', 256))
+    # What each cached query reads, for the response cache
+    response_plans = DocumentCache(getattr(settings, 'CRM_GRAPHQL_DOCUMENT_CACHE_SIZE', 256))
+
+    def get_persisted_query_hash(self, request, data):
+        extensions = request.GET.get('extensions') or data.get('extensions')
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest("Extensions are invalid JSON."))
+        persisted_query = (extensions or {}).get('persistedQuery')
+        if not isinstance(persisted_query, dict):
+            return None
+        return persisted_query.get('sha256Hash')
+
+    def wants_stream(self, request, data):
+        return (request.GET.get('stream') or data.get('stream')) in (True, 'true', '1')
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        streaming_content = getattr(request, 'crm_streaming_content', None)
+        if streaming_content is None:
+            return response
+        return StreamingHttpResponse(streaming_content, content_type='application/json')
+
+    def get_document(self, query):
+        """Return the parsed document for query, or an ExecutionResult with its errors"""
+        key = query_hash(query)
+        document = self.document_cache.get(key)
+        if document is not None:
+            return document
+
+        start = time.perf_counter()
+        try:
+            document = parse(query)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+        validation_errors = validate(
+            self.schema.graphql_schema,
+            document,
+            self.validation_rules,
+            graphene_settings.MAX_VALIDATION_ERRORS,
+        )
+        if validation_errors:
+            return ExecutionResult(data=None, errors=validation_errors)
+        # Only valid documents are cached, so a hit never needs validating again
+        self.document_cache.set(key, document, time.perf_counter() - start)
+        return document
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
+        sha256_hash = self.get_persisted_query_hash(request, data)
+        if sha256_hash:
+            persisted_queries = caches[getattr(settings, 'CRM_PERSISTED_QUERY_CACHE', 'default')]
+            cache_key = f'crm:apq:{sha256_hash}'
+            if query:
+                if query_hash(query) != sha256_hash:
+                    return ExecutionResult(errors=[GraphQLError(
+                        "provided sha does not match query",
+                        extensions={'code': 'PERSISTED_QUERY_HASH_MISMATCH'},
+                    )])
+                persisted_queries.set(cache_key, query, timeout=None)
+            else:
+                query = persisted_queries.get(cache_key)
+                if query is None:
+                    return ExecutionResult(errors=[GraphQLError(
+                        "PersistedQueryNotFound",
+                        extensions={'code': 'PERSISTED_QUERY_NOT_FOUND'},
+                    )])
+
+        if not query:
+            return super().execute_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql
+            )
+
+        document = self.get_document(query)
+        if isinstance(document, ExecutionResult):
+            return document
+
+        # From here on this mirrors GraphQLView.execute_graphql_request
+        operation_ast = get_operation_ast(document, operation_name)
+        if (
+            request.method.lower() == 'get'
+            and operation_ast is not None
+            and operation_ast.operation != OperationType.QUERY
+        ):
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'],
+                f"Can only perform a {operation_ast.operation.value} operation from a POST request.",
+            ))
+
+        # Cost depends on the variables (first: $n), so it is checked per request
+        cost_rule, cost = QueryCostRule.for_request(variables, operation_name)
+        cost_errors = validate(self.schema.graphql_schema, document, [cost_rule])
+        if cost_errors:
+            return ExecutionResult(data=None, errors=cost_errors)
+        request.crm_cost_counter = CostCounter()
+        request.crm_extensions = {'cost': cost}
+
+        if self.wants_stream(request, data):
+            groups = root_field_groups(operation_ast)
+            if groups:
+                request.crm_stream = ListStream(getattr(settings, 'CRM_STREAM_CHUNK_SIZE', 1000))
+                request.crm_streaming_content = self.stream_document(
+                    request, document, operation_ast, groups, variables, operation_name
+                )
+                # Stands in for the result; dispatch() sends the stream instead
+                return ExecutionResult(data=None)
+
+        cache = get_cache()
+        if cache is None or operation_ast is None or operation_ast.operation != OperationType.QUERY:
+            return self.execute_document(request, document, operation_ast, variables, operation_name)
+
+        plan = self.get_response_plan(query, document)
+        if plan.ttl <= 0:
+            return self.execute_document(request, document, operation_ast, variables, operation_name)
+        cache_key = plan.cache_key(cache, variables, operation_name)
+        data = cache.get(cache_key)
+        if data is not None:
+            cost.update(actual=0, cached=True)
+            return ExecutionResult(data=data)
+        result = self.execute_document(request, document, operation_ast, variables, operation_name)
+        if not result.errors:
+            cache.set(cache_key, result.data, timeout=plan.ttl)
+        return result
+
+    def get_middleware(self, request):
+        counter = getattr(request, 'crm_cost_counter', None)
+        if counter is None:
+            return self.middleware
+        if isinstance(self.middleware, MiddlewareManager):
+            return MiddlewareManager(*self.middleware.middlewares, counter)
+        return [*(self.middleware or []), counter]
+
+    def json_encode(self, request, d, pretty=False):
+        extensions = getattr(request, 'crm_extensions', None)
+        if extensions and isinstance(d, dict):
+            counter = getattr(request, 'crm_cost_counter', None)
+            if counter is not None:
+                extensions['cost'].setdefault('actual', counter.count)
+            d = {**d, 'extensions': extensions}
+        return super().json_encode(request, d, pretty)
+
+    def get_response_plan(self, query, document):
+        key = query_hash(query)
+        plan = self.response_plans.get(key)
+        if plan is None:
+            start = time.perf_counter()
+            plan = ResponsePlan(self.schema, document)
+            self.response_plans.set(key, plan, time.perf_counter() - start)
+        return plan
+
+    def execute_document(self, request, document, operation_ast, variables, operation_name):
+        try:
+            execute_options = {
+                'root_value': self.get_root_value(request),
+                'context_value': self.get_context(request),
+                'variable_values': variables,
+                'operation_name': operation_name,
+                'middleware': self.get_middleware(request),
+            }
+            if self.execution_context_class:
+                execute_options['execution_context_class'] = self.execution_context_class
+
+            schema = self.schema.graphql_schema
+            if (
+                operation_ast is not None
+                and operation_ast.operation == OperationType.MUTATION
+                and (
+                    graphene_settings.ATOMIC_MUTATIONS is True
+                    or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True
+                )
+            ):
+                with transaction.atomic():
+                    result = execute(schema, document, **execute_options)
+                    if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                        transaction.set_rollback(True)
+                return result
+
+            return execute(schema, document, **execute_options)
+        except Exception as e:
+            return ExecutionResult(errors=[e])
+
+    def execute_fields(self, request, document, variables, operation_name):
+        """Execute document with loaders of its own"""
+        context = copy(request)
+        context.__dict__.pop('_crm_loaders', None)
+        return self.execute_document(
+            context, document, get_operation_ast(document, operation_name), variables, operation_name
+        )
+
+    def stream_document(self, request, document, operation_ast, groups, variables, operation_name):
+        """Yield the JSON response of a query piece by piece
+
+        Root fields run one after another. A streamed list field runs once
+        per chunk, and each chunk is written out before the next is read;
+        error paths inside it are shifted by the items already sent.
+        """
+        stream = request.crm_stream
+        errors = []
+
+        def execute(field_document, key, offset=0):
+            result = self.execute_fields(request, field_document, variables, operation_name)
+            for error in result.errors or ():
+                formatted = self.format_error(error)
+                path = formatted.get('path')
+                if offset and path and len(path) > 1 and path[0] == key:
+                    path[1] += offset
+                errors.append(formatted)
+            return result.data
+
+        yield '{"data":{'
+        separator = ''
+        for fields in groups:
+            key = response_key(fields[0])
+            field_document = select_fields(document, operation_ast, fields)
+            data = execute(field_document, key)
+            if data is not None and key not in data:
+                # Left out by @skip or @include
+                continue
+            value = data and data[key]
+            yield f'{separator}{compact_json(key)}:'
+            separator = ','
+            if not stream.is_streaming(key):
+                yield compact_json(value)
+                continue
+
+            yield '['
+            sent = 0
+            while value:
+                yield ('' if not sent else ',') + ','.join(compact_json(item) for item in value)
+                sent += len(value)
+                data = execute(field_document, key, sent)
+                value = data and data[key]
+            yield ']'
+        yield '}'
+
+        if errors:
+            yield f',"errors":{compact_json(errors)}'
+        extensions = getattr(request, 'crm_extensions', None)
+        if extensions:
+            extensions['cost']['actual'] = request.crm_cost_counter.count
+            yield f',"extensions":{compact_json(extensions)}'
+        yield '}'
+
+
+class AsyncGraphQLView(CachedGraphQLView):
+    """CachedGraphQLView for ASGI deployments
+
+    Under ASGI, Django runs sync views on the single thread it keeps for
+    thread-sensitive code, so every GraphQL request in the process waits
+    behind the slowest one. This view is async: it hands each request to
+    the shared thread pool, where requests run side by side, each thread
+    with its own database connection.
+
+    The sibling root fields of a query (`customers` and `orders` in a
+    report) run concurrently as well, split across at most
+    CRM_GRAPHQL_ROOT_FIELD_CONCURRENCY threads: the request's own, plus
+    threads of a pool of CRM_GRAPHQL_ROOT_FIELD_WORKERS shared by the
+    process, which caps the extra database connections. Each thread reads
+    through its own connection and so its own snapshot: a write committed
+    meanwhile may show in one root field and not in its sibling. Set the
+    concurrency to 1 to run every field on the request's connection, as
+    the sync view does. Mutation fields still run one after another.
+    """
+
+    view_is_async = True
+    root_field_executor = ThreadPoolExecutor(
+        max_workers=getattr(settings, 'CRM_GRAPHQL_ROOT_FIELD_WORKERS', 8),
+        thread_name_prefix='graphql-root-field',
+    )
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = await sync_to_async(self.dispatch_in_thread, thread_sensitive=False)(
+            request, *args, **kwargs
+        )
+        if response.streaming and not response.is_async:
+            # Django would buffer a sync iterator whole under ASGI
+            response.streaming_content = iterate_in_thread(response.streaming_content)
+        return response
+
+    def dispatch_in_thread(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Pool threads outlive the request: close their connection as a request would
+            close_old_connections()
+
+    def execute_document(self, request, document, operation_ast, variables, operation_name):
+        groups = root_field_groups(operation_ast)
+        concurrency = max(1, getattr(settings, 'CRM_GRAPHQL_ROOT_FIELD_CONCURRENCY', 4))
+        buckets = [groups[start::concurrency] for start in range(min(concurrency, len(groups)))]
+        if len(buckets) < 2:
+            return super().execute_document(request, document, operation_ast, variables, operation_name)
+
+        def bucket_document(bucket):
+            return select_fields(document, operation_ast, [field for fields in bucket for field in fields])
+
+        # A pool of its own: waiting on the request pool from inside it can deadlock
+        futures = [
+            self.root_field_executor.submit(
+                self.execute_bucket_in_pool, request, bucket_document(bucket), variables, operation_name,
+            )
+            for bucket in buckets[1:]
+        ]
+        # The first bucket runs here, on the request's connection
+        results = [self.execute_bucket(request, bucket_document(buckets[0]), variables, operation_name)]
+        results.extend(future.result() for future in futures)
+
+        data = {}
+        errors = []
+        for result in results:
+            errors.extend(result.errors or ())
+            if result.data is None:
+                # A non-null root field failed, which nulls the whole result
+                data = None
+            elif data is not None:
+                data.update(result.data)
+        if data is not None:
+            # Back in the order the query asked for
+            data = {key: data[key] for key in (response_key(fields[0]) for fields in groups) if key in data}
+        return ExecutionResult(data=data, errors=errors or None)
+
+    def execute_bucket(self, request, document, variables, operation_name):
+        """Execute a bucket's root fields one after another, with loaders of their own"""
+        context = copy(request)
+        context.__dict__.pop('_crm_loaders', None)
+        return super().execute_document(
+            context, document, get_operation_ast(document, operation_name), variables, operation_name
+        )
+
+    def execute_bucket_in_pool(self, request, document, variables, operation_name):
+        try:
+            return self.execute_bucket(request, document, variables, operation_name)
+        finally:
+            close_old_connections()
+
+
+def graphql_cache_stats(request):
+    """Hit/miss counters of this process's GraphQL document cache"""
+    return JsonResponse({
+        **CachedGraphQLView.document_cache.stats(),
+        'response_plans': CachedGraphQLView.response_plans.stats(),
+    })